@@ -0,0 +1,431 @@
+"""Almacenamiento opcional en SQLite para el boletín y el chat.
+
+Se activa con la variable de entorno `TFN_ALMACEN=sqlite` (por defecto se
+siguen usando los JSON `datos.json` / `chat_datos.json`). El archivo de base
+se configura con `TFN_SQLITE_FILE`.
+
+- Las cargas reemplazan el dataset completo dentro de una única transacción,
+  así que los lectores ven la versión anterior hasta el COMMIT (modo WAL).
+- Los filtros de `/api/chat/query` usan índices: fecha sobre `fecha_ord`,
+  sala y tribunal sobre `chat_valores` (un valor por columna, así una fila
+  con Sala_TFN y Sala_CNCAF coincide por cualquiera de las dos, igual que con
+  JSON), expediente sobre la tabla FTS5 trigram `chat_expedientes` (búsqueda
+  de subcadenas) y tema sobre la tabla FTS5 `chat_fts` (carátula/tema/resuelve
+  sin acentos).
+- Cada worker mantiene un pequeño pool de conexiones reutilizables.
+"""
+import json
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+from compilador_consultas import normalizar_texto, valores
+from indice_fechas import ordinales_de_hoja
+
+ALMACEN = os.environ.get('TFN_ALMACEN', 'json').lower()
+SQLITE_FILE = os.environ.get('TFN_SQLITE_FILE', 'tfndata.sqlite3')
+TAMANO_POOL = int(os.environ.get('TFN_SQLITE_POOL', 4))
+
+ESQUEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+
+CREATE TABLE IF NOT EXISTS boletin_registros (
+    id INTEGER PRIMARY KEY,
+    hoja TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    fecha_ord INTEGER,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_boletin_hoja ON boletin_registros (hoja, posicion);
+CREATE INDEX IF NOT EXISTS idx_boletin_fecha ON boletin_registros (hoja, fecha_ord);
+
+CREATE TABLE IF NOT EXISTS chat_registros (
+    id INTEGER PRIMARY KEY,
+    hoja TEXT NOT NULL,
+    posicion INTEGER NOT NULL,
+    fecha_ord INTEGER,
+    datos TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_hoja ON chat_registros (hoja);
+CREATE INDEX IF NOT EXISTS idx_chat_fecha ON chat_registros (fecha_ord);
+
+-- Un valor por columna de sala/vocalía/tribunal de cada fila
+CREATE TABLE IF NOT EXISTS chat_valores (
+    campo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    registro_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_valores ON chat_valores (campo, valor, registro_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chat_expedientes USING fts5(
+    registro_id UNINDEXED, valor,
+    tokenize = 'trigram'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS chat_fts USING fts5(
+    caratula, tema, resuelve,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+'''
+
+# Subcadenas más cortas que un trigrama no pueden usar el índice de chat_expedientes
+LARGO_MINIMO_TRIGRAMA = 3
+
+# Hojas del boletín dentro del JSON (mismo orden que en app.py)
+CLAVES_BOLETIN = ('tfn', 'tfn_cncaf', 'tfn_cncaf_csjn')
+
+
+def habilitado():
+    """True si la configuración pide usar SQLite en lugar de los JSON"""
+    return ALMACEN == 'sqlite'
+
+
+class PoolConexiones:
+    """Pool LIFO de conexiones SQLite por proceso.
+
+    Las conexiones no se comparten entre procesos: si el pool detecta que
+    corre en un proceso hijo (fork de gunicorn) descarta las heredadas.
+    """
+
+    def __init__(self, ruta, tamano=TAMANO_POOL):
+        self.ruta = ruta
+        self.tamano = tamano
+        self._pid = os.getpid()
+        self._libres = queue.LifoQueue()
+        self._esquema_listo = False
+
+    def _nueva(self):
+        conexion = sqlite3.connect(self.ruta, isolation_level=None, check_same_thread=False, timeout=30)
+        conexion.execute('PRAGMA journal_mode=WAL')
+        conexion.execute('PRAGMA synchronous=NORMAL')
+        conexion.execute('PRAGMA busy_timeout=30000')
+        if not self._esquema_listo:
+            conexion.executescript(ESQUEMA)
+            self._esquema_listo = True
+        return conexion
+
+    @contextmanager
+    def conexion(self):
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._libres = queue.LifoQueue()
+        try:
+            conexion = self._libres.get_nowait()
+        except queue.Empty:
+            conexion = self._nueva()
+        try:
+            yield conexion
+        finally:
+            if self._libres.qsize() < self.tamano:
+                self._libres.put(conexion)
+            else:
+                conexion.close()
+
+
+_pool = None
+
+
+def pool():
+    """Pool del archivo configurado (se recrea si cambia SQLITE_FILE)"""
+    global _pool
+    if _pool is None or _pool.ruta != SQLITE_FILE:
+        _pool = PoolConexiones(SQLITE_FILE)
+    return _pool
+
+
+@contextmanager
+def transaccion():
+    """Transacción de escritura: los lectores siguen viendo la versión anterior hasta el COMMIT"""
+    with pool().conexion() as conexion:
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            yield conexion
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        conexion.execute('COMMIT')
+
+
+def _valores_columna(item, fragmento):
+    return [str(v) for k, v in item.items() if v and fragmento in k.lower()]
+
+
+def _textos(item, fragmento):
+    return ' '.join(str(v) for k, v in item.items() if v and fragmento in k.lower())
+
+
+def _guardar_meta(conexion, clave, valor):
+    conexion.execute('INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)', (clave, valor))
+
+
+def _leer_meta(conexion, clave):
+    fila = conexion.execute('SELECT valor FROM meta WHERE clave = ?', (clave,)).fetchone()
+    return fila[0] if fila else None
+
+
+# BOLETIN
+
+def guardar_boletin(datos):
+    """Reemplaza el boletín completo en una transacción"""
+    with transaccion() as conexion:
+        conexion.execute('DELETE FROM boletin_registros')
+        for hoja in CLAVES_BOLETIN:
+            registros = datos.get(hoja, [])
+            ordinales = ordinales_de_hoja(datos, hoja, registros)
+            conexion.executemany(
+                'INSERT INTO boletin_registros (hoja, posicion, fecha_ord, datos) VALUES (?, ?, ?, ?)',
+                (
+                    (
+                        hoja, posicion,
+                        ordinales[posicion],
+                        json.dumps(item, ensure_ascii=False)
+                    )
+                    for posicion, item in enumerate(registros)
+                )
+            )
+        _guardar_meta(conexion, 'boletin_fecha_actualizacion', datos['fecha_actualizacion'])
+
+
+def resumen_boletin():
+    """Fecha de actualización y cantidad de registros por hoja, o None si no hay datos"""
+    with pool().conexion() as conexion:
+        fecha = _leer_meta(conexion, 'boletin_fecha_actualizacion')
+        if fecha is None:
+            return None
+        conteos = dict(conexion.execute('SELECT hoja, COUNT(*) FROM boletin_registros GROUP BY hoja'))
+    return {'fecha_actualizacion': fecha, 'conteos': {h: conteos.get(h, 0) for h in CLAVES_BOLETIN}}
+
+
+def boletin_json(orden=None):
+    """JSON del boletín armado directamente desde las filas guardadas.
+
+    Las filas ya están serializadas en la base, así que se concatenan sin
+    pasar por objetos Python. `orden` puede ser None, 'fecha' o 'fecha_asc'.
+    Devuelve None si no hay datos.
+    """
+    orden_sql = {
+        None: 'posicion',
+        'fecha': 'fecha_ord IS NULL, fecha_ord DESC, posicion',
+        'fecha_asc': 'fecha_ord IS NULL, fecha_ord, posicion'
+    }[orden]
+
+    with pool().conexion() as conexion:
+        fecha = _leer_meta(conexion, 'boletin_fecha_actualizacion')
+        if fecha is None:
+            return None
+        partes = [f'{{"fecha_actualizacion": {json.dumps(fecha)}']
+        for hoja in CLAVES_BOLETIN:
+            filas = conexion.execute(
+                f'SELECT datos FROM boletin_registros WHERE hoja = ? ORDER BY {orden_sql}', (hoja,)
+            )
+            partes.append(f', "{hoja}": [' + ','.join(fila[0] for fila in filas) + ']')
+    return ''.join(partes) + '}'
+
+
+# CHAT
+
+def _indexar_chat(conexion, filas):
+    """Carga las tablas de búsqueda (FTS5, sala/vocalía/tribunal, expedientes) para filas (id, item)"""
+    conexion.executemany(
+        'INSERT INTO chat_fts (rowid, caratula, tema, resuelve) VALUES (?, ?, ?, ?)',
+        (
+            (registro_id, _textos(item, 'caratula'), _textos(item, 'tema'), _textos(item, 'resuelve'))
+            for registro_id, item in filas
+        )
+    )
+    conexion.executemany(
+        'INSERT INTO chat_valores (campo, valor, registro_id) VALUES (?, ?, ?)',
+        (
+            (campo, normalizar(valor), registro_id)
+            for registro_id, item in filas
+            for campo, normalizar in (('sala', str.upper), ('vocalia', str.lower), ('tribunal', str.lower))
+            for valor in _valores_columna(item, campo)
+        )
+    )
+    conexion.executemany(
+        'INSERT INTO chat_expedientes (registro_id, valor) VALUES (?, ?)',
+        (
+            (registro_id, valor)
+            for registro_id, item in filas
+            for valor in _valores_columna(item, 'expediente')
+        )
+    )
+
+
+def _vaciar_indices_chat(conexion):
+    for tabla in ('chat_fts', 'chat_valores', 'chat_expedientes'):
+        conexion.execute(f'DELETE FROM {tabla}')
+
+
+def guardar_chat(datos_chat):
+    """Reemplaza los datos del chat (registros + tablas de búsqueda) en una transacción"""
+    with transaccion() as conexion:
+        conexion.execute('DELETE FROM chat_registros')
+        _vaciar_indices_chat(conexion)
+        siguiente_id = 1
+        for hoja, registros in datos_chat['tribunales'].items():
+            ids = range(siguiente_id, siguiente_id + len(registros))
+            siguiente_id += len(registros)
+            ordinales = ordinales_de_hoja(datos_chat, hoja, registros)
+            conexion.executemany(
+                'INSERT INTO chat_registros (id, hoja, posicion, fecha_ord, datos) VALUES (?, ?, ?, ?, ?)',
+                (
+                    (registro_id, hoja, posicion, ordinales[posicion], json.dumps(item, ensure_ascii=False))
+                    for posicion, (registro_id, item) in enumerate(zip(ids, registros))
+                )
+            )
+            _indexar_chat(conexion, list(zip(ids, registros)))
+        _guardar_meta(conexion, 'chat_fecha_carga', datos_chat['fecha_carga'])
+
+
+def resumen_chat():
+    """Fecha de carga y cantidad de registros por hoja, o None si no hay datos"""
+    with pool().conexion() as conexion:
+        fecha = _leer_meta(conexion, 'chat_fecha_carga')
+        if fecha is None:
+            return None
+        conteos = dict(conexion.execute(
+            'SELECT hoja, COUNT(*) FROM chat_registros GROUP BY hoja ORDER BY MIN(id)'
+        ))
+    return {'fecha_carga': fecha, 'tribunales': conteos}
+
+
+def _en(columna, cantidad):
+    return f"{columna} IN ({', '.join('?' * cantidad)})"
+
+
+def _consulta_fts(temas):
+    terminos = ['"' + normalizar_texto(t).replace('"', '""') + '"*' for t in temas]
+    return ' OR '.join(terminos)
+
+
+def _condiciones_chat(plan, hojas, pasos=None):
+    """Traduce el plan compilado a una cláusula WHERE sobre chat_registros.
+
+    Las decisiones a nivel de hoja (tribunal o año en el nombre de la hoja)
+    se resuelven en Python y se expresan como `hoja IN (...)`.
+    """
+    condiciones = []
+    parametros = []
+
+    for paso in plan.pasos:
+        if pasos is not None and paso not in pasos:
+            continue
+        if paso == 'expediente':
+            buscados = [e.lower() for e in valores(plan.filtros, 'expediente')]
+            largos = [b for b in buscados if len(b) >= LARGO_MINIMO_TRIGRAMA]
+            cortos = [b for b in buscados if len(b) < LARGO_MINIMO_TRIGRAMA]
+            partes = []
+            if largos:
+                partes.append('id IN (SELECT registro_id FROM chat_expedientes WHERE chat_expedientes MATCH ?)')
+                parametros.append(' OR '.join('"' + b.replace('"', '""') + '"' for b in largos))
+            if cortos:
+                partes.append(
+                    'id IN (SELECT registro_id FROM chat_expedientes WHERE '
+                    + ' OR '.join('instr(lower(valor), ?) > 0' for _ in cortos) + ')'
+                )
+                parametros.extend(cortos)
+            condiciones.append('(' + ' OR '.join(partes) + ')')
+
+        elif paso == 'sala':
+            buscadas = valores(plan.filtros, 'sala')
+            condiciones.append(
+                "id IN (SELECT registro_id FROM chat_valores WHERE campo = 'sala' AND " + _en('valor', len(buscadas)) + ')'
+            )
+            parametros.extend(buscadas)
+
+        elif paso == 'fecha':
+            completas = [h for h in hojas if not plan.filtra_fecha_por_fila(h)]
+            partes = ['fecha_ord BETWEEN ? AND ?' for _ in plan.intervalos]
+            for desde, hasta in plan.intervalos:
+                parametros.extend((desde, hasta))
+            if completas:
+                partes.append(_en('hoja', len(completas)))
+                parametros.extend(completas)
+            condiciones.append('(' + (' OR '.join(partes) or '0') + ')')
+
+        elif paso == 'tema':
+            condiciones.append('id IN (SELECT rowid FROM chat_fts WHERE chat_fts MATCH ?)')
+            parametros.append(_consulta_fts(valores(plan.filtros, 'tema')))
+
+        elif paso == 'tribunal':
+            buscados = [t.lower() for t in valores(plan.filtros, 'tribunal')]
+            por_hoja = [h for h in hojas if any(t in normalizar_texto(h) for t in buscados)]
+            partes = [
+                "id IN (SELECT registro_id FROM chat_valores WHERE campo = 'tribunal' AND ("
+                + ' OR '.join('instr(valor, ?) > 0' for _ in buscados) + '))'
+            ]
+            parametros.extend(buscados)
+            if por_hoja:
+                partes.append(_en('hoja', len(por_hoja)))
+                parametros.extend(por_hoja)
+            condiciones.append('(' + ' OR '.join(partes) + ')')
+
+    return ' AND '.join(condiciones) or '1', parametros
+
+
+def consultar_chat(plan, limite=10):
+    """Ejecuta el plan contra SQLite.
+
+    Devuelve (conteo_por_hoja, primeros_resultados) o None si no hay datos.
+    Sólo se deserializan las filas que se devuelven al cliente.
+    """
+    with pool().conexion() as conexion:
+        if _leer_meta(conexion, 'chat_fecha_carga') is None:
+            return None
+        hojas = [fila[0] for fila in conexion.execute('SELECT DISTINCT hoja FROM chat_registros')]
+        where, parametros = _condiciones_chat(plan, hojas)
+
+        conteos = dict(conexion.execute(
+            f'SELECT hoja, COUNT(*) FROM chat_registros WHERE {where} GROUP BY hoja ORDER BY MIN(id)',
+            parametros
+        ))
+        primeros = []
+        for hoja, datos in conexion.execute(
+            f'SELECT hoja, datos FROM chat_registros WHERE {where} ORDER BY id LIMIT ?',
+            parametros + [limite]
+        ):
+            item = json.loads(datos)
+            item['_fuente'] = hoja
+            primeros.append(item)
+
+    return conteos, primeros
+
+
+def iterar_chat(plan, limite):
+    """Genera hasta `limite` resultados, de la sentencia más reciente a la más antigua.
+
+    El cursor se consume de a poco, así que el primer resultado sale antes de
+    terminar la consulta completa.
+    """
+    with pool().conexion() as conexion:
+        hojas = [fila[0] for fila in conexion.execute('SELECT DISTINCT hoja FROM chat_registros')]
+        where, parametros = _condiciones_chat(plan, hojas)
+        cursor = conexion.execute(
+            f'SELECT hoja, datos FROM chat_registros WHERE {where} '
+            'ORDER BY fecha_ord IS NULL, fecha_ord DESC, id LIMIT ?',
+            parametros + [limite]
+        )
+        for hoja, datos in cursor:
+            item = json.loads(datos)
+            item['_fuente'] = hoja
+            yield item
+
+
+def estimar_chat(plan):
+    """Estimación rápida de la cantidad de resultados (None si no hay datos).
+
+    El filtro de fecha se cuenta exacto con el índice; el resto se aproxima
+    con la selectividad estimada de cada paso.
+    """
+    with pool().conexion() as conexion:
+        if _leer_meta(conexion, 'chat_fecha_carga') is None:
+            return None
+        hojas = [fila[0] for fila in conexion.execute('SELECT DISTINCT hoja FROM chat_registros')]
+        where, parametros = _condiciones_chat(plan, hojas, pasos={'fecha'})
+        total = conexion.execute(f'SELECT COUNT(*) FROM chat_registros WHERE {where}', parametros).fetchone()[0]
+    return round(total * plan.factor_selectividad(incluir_fecha=False))
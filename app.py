@@ -1,11 +1,16 @@
-from flask import Flask, request, jsonify, render_template_string
+import arranque
+from flask import Flask, Response, request, jsonify, render_template_string
 from flask_cors import CORS
-import openpyxl
 import json
 import os
 from datetime import datetime
-import io
-import traceback
+
+import almacen_sqlite
+import estaticos
+import ingesta
+from indice_fechas import construir_indices, separar_fechas
+
+arranque.marcar('imports')
 
 app = Flask(__name__)
 CORS(app)
@@ -13,122 +18,47 @@ CORS(app)
 # Archivo donde se guardan los datos DEL BOLETIN (independiente del chat)
 DATOS_FILE = 'datos.json'
 
-def leer_excel_y_convertir(archivo_excel):
-    """Convierte el Excel a formato JSON usando openpyxl - VERSIÓN CORREGIDA"""
-    try:
-        print(f"🔍 Procesando archivo: {archivo_excel.filename}")
-        
-        # En lugar de pasar el archivo directamente, lo leemos en memoria
-        archivo_excel.seek(0)
-        file_content = archivo_excel.read()
-        
-        # Crear un objeto BytesIO para simular un archivo
-        excel_buffer = io.BytesIO(file_content)
-        
-        # Cargar el workbook desde el buffer
-        workbook = openpyxl.load_workbook(excel_buffer, data_only=True)
-        
-        datos = {
-            'fecha_actualizacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'tfn': [],
-            'tfn_cncaf': [],
-            'tfn_cncaf_csjn': []
-        }
-        
-        print(f"📊 Hojas encontradas: {workbook.sheetnames}")
-        
-        # Procesar cada hoja
-        sheet_mapping = {
-            'TFN': 'tfn',
-            'TFN_CNCAF': 'tfn_cncaf', 
-            'TFN_CNCAF_CSJN': 'tfn_cncaf_csjn'
-        }
-        
-        for sheet_name, data_key in sheet_mapping.items():
-            if sheet_name in workbook.sheetnames:
-                print(f"📄 Procesando hoja: {sheet_name}")
-                sheet = workbook[sheet_name]
-                
-                # Leer headers (primera fila) - CON DEBUG DETALLADO
-                headers = []
-                print(f"🔍 DEBUG - Leyendo headers de {sheet_name}:")
-                for i, cell in enumerate(sheet[1]):
-                    if cell.value is None:
-                        headers.append('')
-                        print(f"   Celda {i}: None -> ''")
-                    else:
-                        # Convertir a string de manera segura CON DEBUG
-                        try:
-                            original_value = cell.value
-                            converted_value = str(original_value).strip()
-                            headers.append(converted_value)
-                            print(f"   Celda {i}: '{original_value}' -> '{converted_value}'")
-                        except Exception as conv_error:
-                            headers.append('')
-                            print(f"   Celda {i}: ERROR en conversión: {conv_error}")
-                
-                print(f"📋 Headers finales para {sheet_name}: {headers}")
-                
-                # NORMALIZAR NOMBRES DE COLUMNAS - CORRECCIÓN CRÍTICA
-                headers_normalizados = []
-                for header in headers:
-                    if header:
-                        # Corregir errores comunes de tipeo
-                        header_normalizado = header.replace('Garatula_TFM', 'Caratula_TFN')
-                        header_normalizado = header_normalizado.replace('Competencia_TFM', 'Competencia_TFN')
-                        header_normalizado = header_normalizado.replace('Expediente_TFM', 'Expediente_TFN')
-                        header_normalizado = header_normalizado.replace('Sala_TFM', 'Sala_TFN')
-                        header_normalizado = header_normalizado.replace('Vocalia_TFM', 'Vocalia_TFN')
-                        header_normalizado = header_normalizado.replace('Resuelve_TFM', 'Resuelve_TFN')
-                        header_normalizado = header_normalizado.replace('Tema_TFM', 'Tema_TFN')
-                        headers_normalizados.append(header_normalizado)
-                    else:
-                        headers_normalizados.append('')
-                
-                print(f"🔧 Headers normalizados: {headers_normalizados}")
-                
-                # Leer datos (desde fila 2 en adelante) - MANERA SEGURA
-                sheet_data = []
-                row_count = 0
-                
-                for row in sheet.iter_rows(min_row=2, values_only=True):
-                    row_count += 1
-                    # Verificar si la fila tiene datos (no todos None)
-                    if any(cell is not None for cell in row):
-                        row_dict = {}
-                        for i, value in enumerate(row):
-                            if i < len(headers_normalizados) and headers_normalizados[i]:
-                                # Convertir valor de manera segura
-                                if value is None:
-                                    row_dict[headers_normalizados[i]] = ''
-                                elif isinstance(value, datetime):
-                                    row_dict[headers_normalizados[i]] = value.strftime('%Y-%m-%d %H:%M:%S')
-                                else:
-                                    try:
-                                        row_dict[headers_normalizados[i]] = str(value)
-                                    except:
-                                        row_dict[headers_normalizados[i]] = ''
-                        
-                        if row_dict:  # Solo agregar si tiene datos
-                            sheet_data.append(row_dict)
-                
-                datos[data_key] = sheet_data
-                print(f"✅ {sheet_name}: {len(sheet_data)} registros procesados")
-        
-        print(f"🎉 Procesamiento completado: TFN={len(datos['tfn'])}, CNCAF={len(datos['tfn_cncaf'])}, CSJN={len(datos['tfn_cncaf_csjn'])}")
-        return datos
-        
-    except Exception as e:
-        print(f"❌ Error detallado en leer_excel_y_convertir: {str(e)}")
-        print(f"📝 Stack trace: {traceback.format_exc()}")
-        raise Exception(f"Error procesando Excel: {str(e)}")
+# Hojas del boletín dentro del JSON
+CLAVES_BOLETIN = ('tfn', 'tfn_cncaf', 'tfn_cncaf_csjn')
+
+# Última versión cargada: (clave del archivo, datos, índices de fechas por hoja)
+_cache_boletin = (None, None, None)
+
+def cargar_datos_boletin():
+    """Cargar los datos del boletín junto con sus índices de fechas.
+
+    El JSON sólo se vuelve a leer cuando cambia el archivo (mtime/tamaño).
+    Devuelve (None, None) si todavía no se subió ningún Excel.
+    """
+    global _cache_boletin
+    if not os.path.exists(DATOS_FILE):
+        return None, None
+    
+    estado = os.stat(DATOS_FILE)
+    clave = (DATOS_FILE, estado.st_mtime_ns, estado.st_size)
+    if _cache_boletin[0] != clave:
+        with open(DATOS_FILE, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        tablas = {k: datos.get(k, []) for k in CLAVES_BOLETIN}
+        _cache_boletin = (clave, datos, construir_indices(tablas, separar_fechas(datos, tablas)))
+    
+    return _cache_boletin[1], _cache_boletin[2]
+
+def ordenar_por_fecha(datos, indices, descendente=True):
+    """Copia de los datos con cada hoja ordenada por fecha usando el índice (sin parsear strings)"""
+    ordenados = dict(datos)
+    for clave in CLAVES_BOLETIN:
+        registros = datos.get(clave, [])
+        ordenados[clave] = [registros[p] for p in indices[clave].orden(descendente)]
+    return ordenados
+
+estaticos.registrar_archivo('index.html', 'index.html')
 
 @app.route('/')
 def dashboard():
-    """Sirve el dashboard principal desde index.html"""
+    """Sirve el dashboard principal desde index.html (cacheado y precomprimido)"""
     try:
-        with open('index.html', 'r', encoding='utf-8') as f:
-            return f.read()
+        return estaticos.servir('index.html')
     except FileNotFoundError:
         return "Error: index.html no encontrado. Asegúrate de que el archivo esté en el repositorio.", 404
 
@@ -137,8 +67,7 @@ def api_status():
     """Endpoint para verificar el estado del backend"""
     return "Backend del Boletín de Trazabilidad funcionando correctamente"
 
-@app.route('/admin')
-def admin():
+def _pagina_admin():
     """Página simple para subir archivos DEL BOLETIN"""
     return render_template_string('''
     <!DOCTYPE html>
@@ -190,6 +119,27 @@ def admin():
         </div>
         
         <script>
+            function esperarCarga(urlEstado, statusDiv, mostrarResultado) {
+                fetch(urlEstado)
+                .then(response => response.json())
+                .then(trabajo => {
+                    if (trabajo.estado === 'completada') {
+                        mostrarResultado(trabajo.resultado);
+                    } else if (trabajo.estado === 'error' || trabajo.error) {
+                        statusDiv.innerHTML = `<div class="error">Error: ${trabajo.error}</div>`;
+                    } else if (trabajo.estado === 'reemplazada') {
+                        statusDiv.innerHTML = '<div class="error">La carga fue reemplazada por otra más reciente</div>';
+                    } else {
+                        const texto = trabajo.estado === 'encolada' ? 'En espera: hay otra carga en curso...' : 'Procesando archivo...';
+                        statusDiv.innerHTML = `<div class="info">${texto}</div>`;
+                        setTimeout(() => esperarCarga(urlEstado, statusDiv, mostrarResultado), 1000);
+                    }
+                })
+                .catch(error => {
+                    statusDiv.innerHTML = `<div class="error">Error de conexión: ${error}</div>`;
+                });
+            }
+
             function subirArchivo() {
                 const fileInput = document.getElementById('fileInput');
                 const statusDiv = document.getElementById('status');
@@ -212,7 +162,10 @@ def admin():
                 .then(data => {
                     if (data.error) {
                         statusDiv.innerHTML = `<div class="error">Error: ${data.error}</div>`;
-                    } else {
+                        return;
+                    }
+                    fileInput.value = '';
+                    const mostrarResultado = data => {
                         statusDiv.innerHTML = `<div class="success">
                             ✓ Archivo procesado exitosamente<br>
                             Fecha: ${data.fecha_actualizacion}<br>
@@ -220,7 +173,11 @@ def admin():
                             TFN-CNCAF: ${data.total_tfn_cncaf} registros<br>
                             TFN-CNCAF-CSJN: ${data.total_tfn_cncaf_csjn} registros
                         </div>`;
-                        fileInput.value = '';
+                    };
+                    if (data.url_estado) {
+                        esperarCarga(data.url_estado, statusDiv, mostrarResultado);
+                    } else {
+                        mostrarResultado(data);
                     }
                 })
                 .catch(error => {
@@ -232,6 +189,13 @@ def admin():
     </html>
     ''')
 
+estaticos.registrar('admin', _pagina_admin)
+
+@app.route('/admin')
+def admin():
+    """Página simple para subir archivos DEL BOLETIN (renderizada una sola vez)"""
+    return estaticos.servir('admin')
+
 @app.route('/api/subir', methods=['POST'])
 def subir_archivo():
     """Endpoint para subir y procesar el Excel DEL BOLETIN"""
@@ -246,41 +210,41 @@ def subir_archivo():
         if not archivo.filename.endswith(('.xlsx', '.xls')):
             return jsonify({'error': 'Solo se permiten archivos Excel (.xlsx, .xls)'}), 400
         
-        print(f"Procesando archivo: {archivo.filename}")  # Log para Render
-        
-        # Procesar Excel
-        datos = leer_excel_y_convertir(archivo)
+        print(f"Archivo recibido: {archivo.filename}")  # Log para Render
         
-        print(f"Datos procesados - TFN: {len(datos['tfn'])}, TFN_CNCAF: {len(datos['tfn_cncaf'])}, TFN_CNCAF_CSJN: {len(datos['tfn_cncaf_csjn'])}")
-        
-        # Guardar en archivo JSON
-        with open(DATOS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, ensure_ascii=False, indent=2)
-        
-        print("Archivo JSON guardado correctamente")
-        
-        # Respuesta con estadísticas
-        return jsonify({
-            'mensaje': 'Archivo procesado exitosamente',
-            'fecha_actualizacion': datos['fecha_actualizacion'],
-            'total_tfn': len(datos['tfn']),
-            'total_tfn_cncaf': len(datos['tfn_cncaf']),
-            'total_tfn_cncaf_csjn': len(datos['tfn_cncaf_csjn'])
-        })
+        # La lectura del Excel corre en un proceso de ingesta aparte (ver ingesta.py)
+        codigo, trabajo = ingesta.programar('boletin', archivo.read(), archivo.filename, DATOS_FILE)
+        return ingesta.respuesta_carga('boletin', codigo, trabajo, '/api/subir/estado')
         
     except Exception as e:
         print(f"Error en subir_archivo: {str(e)}")  # Log para debugging
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/subir/estado')
+def estado_subida():
+    """Estado de una carga del boletín (?id=...) o de la carga en curso"""
+    return ingesta.respuesta_estado('boletin')
+
 @app.route('/api/datos')
 def obtener_datos():
     """Endpoint que devuelve los datos para el frontend DEL BOLETIN"""
     try:
-        if not os.path.exists(DATOS_FILE):
+        orden = request.args.get('orden')
+        if orden not in (None, 'fecha', 'fecha_asc'):
+            return jsonify({'error': "Parámetro 'orden' inválido (usar 'fecha' o 'fecha_asc')"}), 400
+        
+        if almacen_sqlite.habilitado():
+            contenido = almacen_sqlite.boletin_json(orden)
+            if contenido is None:
+                return jsonify({'error': 'No hay datos disponibles. Sube un archivo Excel primero.'}), 404
+            return Response(contenido, mimetype='application/json')
+        
+        datos, indices = cargar_datos_boletin()
+        if datos is None:
             return jsonify({'error': 'No hay datos disponibles. Sube un archivo Excel primero.'}), 404
         
-        with open(DATOS_FILE, 'r', encoding='utf-8') as f:
-            datos = json.load(f)
+        if orden:
+            datos = ordenar_por_fecha(datos, indices, descendente=(orden == 'fecha'))
         
         return jsonify(datos)
         
@@ -295,12 +259,26 @@ def test():
         'status': 'OK',
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'datos_file_exists': os.path.exists(DATOS_FILE),
+        'almacenamiento': almacen_sqlite.ALMACEN,
         'current_directory': os.getcwd(),
         'files_in_directory': os.listdir('.') if os.path.exists('.') else [],
-        'environment': 'RENDER' if 'RENDER' in os.environ else 'LOCAL'
+        'environment': 'RENDER' if 'RENDER' in os.environ else 'LOCAL',
+        'arranque': arranque.reporte()
     }
     
-    if os.path.exists(DATOS_FILE):
+    if almacen_sqlite.habilitado():
+        try:
+            resumen = almacen_sqlite.resumen_boletin()
+            if resumen:
+                test_info['data_summary'] = {
+                    'fecha_actualizacion': resumen['fecha_actualizacion'],
+                    'tfn_records': resumen['conteos']['tfn'],
+                    'tfn_cncaf_records': resumen['conteos']['tfn_cncaf'],
+                    'tfn_cncaf_csjn_records': resumen['conteos']['tfn_cncaf_csjn']
+                }
+        except Exception as e:
+            test_info['error_reading_data'] = str(e)
+    elif os.path.exists(DATOS_FILE):
         file_size = os.path.getsize(DATOS_FILE)
         test_info['datos_file_size_bytes'] = file_size
         test_info['datos_file_size_mb'] = round(file_size / (1024 * 1024), 2)
@@ -326,10 +304,41 @@ try:
     print("✓ Chat API integrado correctamente")
 except ImportError as e:
     print(f"⚠ Chat API no disponible: {e}")
+arranque.marcar('chat_api')
+
+# Renderizar y comprimir las páginas estáticas una sola vez, al iniciar
+with arranque.fase('estaticos'), app.app_context():
+    estaticos.precargar()
+
+def precalentar():
+    """Carga e indexa los datos actuales del boletín y del chat antes de atender requests.
+    
+    Con gunicorn `preload_app` (ver gunicorn.conf.py) corre una sola vez en el
+    proceso master y los workers heredan los datos por copy-on-write. Con SQLite
+    no hay nada que precargar: los datos se consultan desde la base.
+    """
+    if almacen_sqlite.habilitado():
+        return
+    
+    with arranque.fase('datos_boletin'):
+        try:
+            cargar_datos_boletin()
+        except Exception as e:
+            print(f"⚠ No se pudieron precargar los datos del boletín: {e}")
+    
+    try:
+        from chat_api import cargar_datos_chat_indexados
+    except ImportError:
+        return
+    with arranque.fase('datos_chat'):
+        cargar_datos_chat_indexados()
 
 if __name__ == '__main__':
     # Configuración para Render
     port = int(os.environ.get('PORT', 5000))
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
     
+    precalentar()
+    arranque.imprimir()
+    
     app.run(debug=debug_mode, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,47 @@
+"""Medición de las fases de arranque del servicio.
+
+Se importa primero en app.py para que `marcar('imports')` cuente desde el
+inicio de la carga de la aplicación.
+"""
+import time
+from contextlib import contextmanager
+
+_INICIO = time.perf_counter()
+_ultima_marca = _INICIO
+
+# Duración de cada fase en segundos, en el orden en que ocurrieron
+FASES = {}
+
+
+def marcar(nombre):
+    """Registra como fase `nombre` el tiempo transcurrido desde la marca anterior"""
+    global _ultima_marca
+    ahora = time.perf_counter()
+    FASES[nombre] = round(ahora - _ultima_marca, 4)
+    _ultima_marca = ahora
+
+
+@contextmanager
+def fase(nombre):
+    """Mide un bloque como fase `nombre`"""
+    global _ultima_marca
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _ultima_marca = time.perf_counter()
+        FASES[nombre] = round(_ultima_marca - inicio, 4)
+
+
+def reporte():
+    """Fases en milisegundos y el total desde que se empezó a cargar la app"""
+    return {
+        'fases_ms': {nombre: round(segundos * 1000, 1) for nombre, segundos in FASES.items()},
+        'total_ms': round((_ultima_marca - _INICIO) * 1000, 1)
+    }
+
+
+def imprimir():
+    for nombre, segundos in FASES.items():
+        print(f"⏱ Arranque - {nombre}: {segundos * 1000:.1f} ms")
+    print(f"⏱ Arranque - total: {(_ultima_marca - _INICIO) * 1000:.1f} ms")
@@ -0,0 +1,6 @@
+"""Benchmarks reproducibles de ingesta y consultas del Boletín y del Chat.
+
+Uso:
+    python -m benchmarks --filas 1000 10000 --salida bench.json
+    python -m benchmarks.carga --workers 1 2 --threads 1 4 --perfil mixto
+"""
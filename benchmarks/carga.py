@@ -0,0 +1,321 @@
+"""Prueba de carga local: levanta `gunicorn app:app` y reproduce tráfico mixto.
+
+Uso:
+    python -m benchmarks.carga --workers 1 2 --threads 1 4 --concurrencia 8 32 \\
+        --perfil mixto --duracion 30 --salida carga.json
+
+Para cada combinación de workers × threads × concurrencia se levanta un
+servidor nuevo sobre un directorio temporal con datos generados, se corre el
+perfil de tráfico durante `--duracion` segundos y se reporta throughput,
+latencias de cola y tasa de error por endpoint.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+from benchmarks.consultas import CONSULTAS
+from benchmarks.ejecutar import percentil
+from benchmarks.generador import generar_workbook_boletin, generar_workbook_chat
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pesos de cada tipo de operación por cliente y cada cuántos segundos se sube un archivo
+PERFILES = {
+    'mixto': {'dashboard': 0.6, 'chat': 0.4, 'intervalo_subida': 10},
+    'dashboard': {'dashboard': 1.0, 'chat': 0.0, 'intervalo_subida': None},
+    'chat': {'dashboard': 0.0, 'chat': 1.0, 'intervalo_subida': None},
+    'subida_continua': {'dashboard': 0.5, 'chat': 0.5, 'intervalo_subida': 2},
+}
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _multipart(campo, filename, contenido):
+    """Arma un cuerpo multipart/form-data con un único archivo"""
+    limite = uuid.uuid4().hex
+    cuerpo = (
+        f'--{limite}\r\n'
+        f'Content-Disposition: form-data; name="{campo}"; filename="{filename}"\r\n'
+        'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'
+    ).encode() + contenido + f'\r\n--{limite}--\r\n'.encode()
+    return cuerpo, f'multipart/form-data; boundary={limite}'
+
+
+def _request(url, datos=None, content_type=None, timeout=60):
+    """Hace la request y devuelve el status HTTP (0 si falló la conexión)"""
+    req = urllib.request.Request(url, data=datos)
+    if content_type:
+        req.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as respuesta:
+            respuesta.read()
+            return respuesta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def _request_json(url, datos=None, content_type=None, timeout=60):
+    """Como _request, pero devuelve (status, cuerpo JSON o None); (0, None) si falló la conexión"""
+    req = urllib.request.Request(url, data=datos)
+    if content_type:
+        req.add_header('Content-Type', content_type)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as respuesta:
+            return respuesta.status, json.loads(respuesta.read() or b'null')
+    except urllib.error.HTTPError as e:
+        return e.code, None
+    except (OSError, ValueError):
+        # URLError, timeouts y conexiones cortadas son OSError; ValueError si el cuerpo no es JSON
+        return 0, None
+
+
+class Registro:
+    """Acumula latencias y errores por endpoint desde varios hilos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+
+    def agregar(self, endpoint, latencia, status):
+        with self._lock:
+            self.latencias.setdefault(endpoint, []).append(latencia)
+            self.errores.setdefault(endpoint, 0)
+            if not 200 <= status < 400:
+                self.errores[endpoint] += 1
+
+    def resumen(self, duracion):
+        resultado = {}
+        for endpoint, latencias in sorted(self.latencias.items()):
+            total = len(latencias)
+            resultado[endpoint] = {
+                'requests': total,
+                'errores': self.errores[endpoint],
+                'tasa_error': round(self.errores[endpoint] / total, 4),
+                'throughput_rps': round(total / duracion, 2),
+                'p50_ms': round(percentil(latencias, 50) * 1000, 2),
+                'p95_ms': round(percentil(latencias, 95) * 1000, 2),
+                'p99_ms': round(percentil(latencias, 99) * 1000, 2),
+                'max_ms': round(max(latencias) * 1000, 2),
+            }
+        return resultado
+
+
+def _medir(registro, endpoint, url, datos=None, content_type=None):
+    inicio = time.perf_counter()
+    status = _request(url, datos, content_type)
+    registro.agregar(endpoint, time.perf_counter() - inicio, status)
+
+
+def preparar_directorio(directorio, filas, semilla=0):
+    """Copia index.html y genera los workbooks que se usan para sembrar y subir"""
+    shutil.copy(os.path.join(RAIZ_REPO, 'index.html'), directorio)
+    return {
+        'boletin': generar_workbook_boletin(filas, semilla=semilla),
+        'chat': generar_workbook_chat(filas, semilla=semilla),
+    }
+
+
+def levantar_servidor(directorio, puerto, workers, threads, extra_args=None):
+    """Inicia gunicorn como en render.yaml (con gunicorn.conf.py) y espera a que responda /api/status"""
+    comando = [
+        sys.executable, '-m', 'gunicorn',
+        '--bind', f'127.0.0.1:{puerto}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--pythonpath', RAIZ_REPO,
+        '--config', os.path.join(RAIZ_REPO, 'gunicorn.conf.py'),
+        '--log-level', 'warning',
+        'app:app'
+    ] + list(extra_args or [])
+    proceso = subprocess.Popen(comando, cwd=directorio, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al iniciar: {proceso.stderr.read().decode(errors='replace')}")
+        if _request(f'http://127.0.0.1:{puerto}/api/status', timeout=1) == 200:
+            return proceso
+        time.sleep(0.2)
+
+    proceso.terminate()
+    raise RuntimeError('gunicorn no respondió en 30 segundos')
+
+
+def detener_servidor(proceso):
+    proceso.terminate()
+    try:
+        proceso.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proceso.kill()
+
+
+def sembrar_datos(base_url, archivos):
+    """Sube los workbooks iniciales para que /api/datos y el chat tengan datos"""
+    for ruta, clave, nombre in (('/api/subir?esperar=1', 'boletin', 'boletin.xlsx'),
+                                ('/api/chat/upload?esperar=1', 'chat', 'chat.xlsx')):
+        cuerpo, content_type = _multipart('archivo', nombre, archivos[clave])
+        status, respuesta = _request_json(base_url + ruta, cuerpo, content_type, timeout=600)
+        if status == 202 and respuesta:
+            # La espera de ?esperar=1 tiene tope (TFN_INGESTA_ESPERA_S): seguir por url_estado
+            status = _esperar_carga(base_url + respuesta['url_estado'])
+        if status != 200:
+            raise RuntimeError(f"No se pudieron sembrar datos en {ruta} (HTTP {status})")
+
+
+def _esperar_carga(url_estado, timeout=600):
+    """Consulta url_estado hasta que la carga termine; 200 si se completó"""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        status, trabajo = _request_json(url_estado)
+        if status != 200 or trabajo is None:
+            return status
+        if trabajo['estado'] == 'completada':
+            return 200
+        if trabajo['estado'] in ('error', 'rechazada', 'reemplazada'):
+            return 500
+        time.sleep(0.5)
+    return 0
+
+
+def _cliente(base_url, perfil, registro, fin, semilla):
+    rng = random.Random(semilla)
+    peso_dashboard = perfil['dashboard'] / ((perfil['dashboard'] + perfil['chat']) or 1)
+    while time.monotonic() < fin:
+        if rng.random() < peso_dashboard:
+            _medir(registro, 'GET /', base_url + '/')
+            _medir(registro, 'GET /api/datos', base_url + '/api/datos')
+        else:
+            cuerpo = json.dumps({'query': rng.choice(CONSULTAS)}).encode()
+            _medir(registro, 'POST /api/chat/query', base_url + '/api/chat/query', cuerpo, 'application/json')
+
+
+def _subidor(base_url, archivos, intervalo, registro, fin):
+    cuerpos = [
+        ('POST /api/subir', base_url + '/api/subir', _multipart('archivo', 'boletin.xlsx', archivos['boletin'])),
+        ('POST /api/chat/upload', base_url + '/api/chat/upload', _multipart('archivo', 'chat.xlsx', archivos['chat'])),
+    ]
+    n = 0
+    while time.monotonic() + intervalo < fin:
+        time.sleep(intervalo)
+        endpoint, url, (cuerpo, content_type) = cuerpos[n % len(cuerpos)]
+        _medir(registro, endpoint, url, cuerpo, content_type)
+        n += 1
+
+
+def generar_trafico(base_url, perfil, concurrencia, duracion, archivos, semilla=0):
+    """Corre `concurrencia` clientes más un subidor periódico y devuelve el resumen"""
+    registro = Registro()
+    fin = time.monotonic() + duracion
+    hilos = [
+        threading.Thread(target=_cliente, args=(base_url, perfil, registro, fin, semilla + i), daemon=True)
+        for i in range(concurrencia)
+    ]
+    if perfil.get('intervalo_subida'):
+        hilos.append(threading.Thread(
+            target=_subidor, args=(base_url, archivos, perfil['intervalo_subida'], registro, fin), daemon=True
+        ))
+
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    return registro.resumen(time.monotonic() - inicio)
+
+
+def ejecutar_matriz(workers, threads, concurrencias, perfil, duracion, filas, semilla=0, extra_args=None):
+    """Recorre la matriz workers × threads × concurrencia y arma el reporte"""
+    reporte = {
+        'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'perfil': perfil,
+        'configuracion_perfil': PERFILES[perfil],
+        'duracion_s': duracion,
+        'filas': filas,
+        'resultados': []
+    }
+
+    with tempfile.TemporaryDirectory(prefix='tfn_carga_') as plantilla:
+        print(f"📦 Generando workbooks sintéticos ({filas} filas)...")
+        archivos = preparar_directorio(plantilla, filas, semilla)
+
+        for w in workers:
+            for t in threads:
+                for c in concurrencias:
+                    with tempfile.TemporaryDirectory(prefix='tfn_carga_run_') as directorio:
+                        shutil.copy(os.path.join(plantilla, 'index.html'), directorio)
+                        puerto = puerto_libre()
+                        base_url = f'http://127.0.0.1:{puerto}'
+                        print(f"🚀 workers={w} threads={t} concurrencia={c}")
+                        try:
+                            proceso = levantar_servidor(directorio, puerto, w, t, extra_args)
+                            try:
+                                sembrar_datos(base_url, archivos)
+                                endpoints = generar_trafico(base_url, PERFILES[perfil], c, duracion, archivos, semilla)
+                            finally:
+                                detener_servidor(proceso)
+                        except RuntimeError as e:
+                            # Se registra la combinación fallida y se sigue con el resto de la matriz
+                            print(f"   ❌ {e}")
+                            reporte['resultados'].append({
+                                'workers': w, 'threads': t, 'concurrencia': c, 'error': str(e)
+                            })
+                            continue
+
+                    for endpoint, m in endpoints.items():
+                        print(f"   {endpoint:<24} {m['throughput_rps']:>8} rps  p50={m['p50_ms']}ms "
+                              f"p99={m['p99_ms']}ms  errores={m['tasa_error']:.2%}")
+                    reporte['resultados'].append({
+                        'workers': w, 'threads': t, 'concurrencia': c, 'endpoints': endpoints
+                    })
+
+    return reporte
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Prueba de carga local con gunicorn')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1])
+    parser.add_argument('--concurrencia', type=int, nargs='+', default=[4])
+    parser.add_argument('--perfil', choices=sorted(PERFILES), default='mixto')
+    parser.add_argument('--duracion', type=float, default=20, help='Segundos de tráfico por combinación')
+    parser.add_argument('--filas', type=int, default=5000, help='Tamaño de los workbooks generados')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el reporte')
+    args, extra_args = parser.parse_known_args(argv)
+
+    reporte = ejecutar_matriz(args.workers, args.threads, args.concurrencia, args.perfil,
+                              args.duracion, args.filas, args.semilla, extra_args)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.salida}")
+    else:
+        print(json.dumps(reporte, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
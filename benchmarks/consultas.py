@@ -0,0 +1,41 @@
+"""Corpus de consultas que ejercita cada filtro de parse_query_basico.
+
+benchmarks/verificar_consultas.py lo usa además como chequeo de regresión del parser.
+"""
+
+CONSULTAS = [
+    # expediente
+    "expediente TF-12345-I",
+    "exp. 4521/2020",
+    # año
+    "sentencias de 2023",
+    "fallos 2019",
+    # sala
+    "casos de la sala G",
+    "resoluciones sala 3",
+    # tribunal
+    "fallos del tribunal fiscal",
+    "sentencias de la cámara",
+    "corte suprema",
+    "csjn 2022",
+    # temas
+    "sentencias sobre prescripción",
+    "regulación de honorarios",
+    "infracciones aduaneras",
+    "nulidad de la determinación",
+    "recurso de apelación",
+    # combinaciones
+    "casos de prescripción sala G 2023",
+    "tfn sala B honorarios 2021",
+    "cncaf nulidad 2022",
+    # varios valores y rangos de años
+    "sala A y B sobre nulidad o honorarios",
+    "tfn y csjn entre 2019 y 2021",
+    "prescripcion desde 2020",
+    # períodos resueltos con el índice de fechas
+    "fallos de marzo de 2022",
+    "sentencias del último año",
+    "últimos 6 meses sala A",
+    # sin filtros (recorrido completo)
+    "todo",
+]
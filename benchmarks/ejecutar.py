@@ -0,0 +1,361 @@
+"""Ejecuta los benchmarks de ingesta y de endpoints y emite un reporte JSON.
+
+Cada caso corre en un proceso nuevo para que el pico de memoria (RSS) medido
+corresponda sólo a ese caso.
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.consultas import CONSULTAS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CASOS = ['ingesta_boletin', 'ingesta_chat', 'api_datos', 'api_chat_query', 'api_chat_stream']
+
+# Datos que cada caso de endpoint necesita ya guardados antes de medir
+DATASET_CASO = {'api_datos': 'boletin', 'api_chat_query': 'chat', 'api_chat_stream': 'chat'}
+
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso actual en MB (None si no se puede medir).
+
+    En Linux se lee VmHWM, que se reinicia con el exec del proceso hijo;
+    ru_maxrss se hereda del padre y mediría la memoria del generador de workbooks.
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return round(int(linea.split()[1]) / 1024, 2)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(maxrss / divisor, 2)
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista de valores"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def resumir(latencias, registros=None):
+    """Arma las métricas de throughput y latencia a partir de latencias en segundos"""
+    total = sum(latencias)
+    resumen = {
+        'operaciones': len(latencias),
+        'tiempo_total_s': round(total, 4),
+        'throughput_ops_s': round(len(latencias) / total, 2) if total else None,
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+    }
+    if registros is not None:
+        resumen['registros'] = registros
+        resumen['throughput_registros_s'] = round(registros * len(latencias) / total, 2) if total else None
+    return resumen
+
+
+@contextlib.contextmanager
+def silencio():
+    """Descarta los print de diagnóstico de los módulos durante la medición"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _archivo_subido(contenido, filename):
+    from werkzeug.datastructures import FileStorage
+    return FileStorage(stream=io.BytesIO(contenido), filename=filename)
+
+
+def _medir(funcion, repeticiones):
+    latencias = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        latencias.append(time.perf_counter() - inicio)
+    return latencias
+
+
+def _caso_ingesta_boletin(ruta_xlsx, repeticiones, directorio):
+    from lectores_excel import leer_excel_y_convertir
+
+    with open(ruta_xlsx, 'rb') as f:
+        contenido = f.read()
+
+    datos = {}
+
+    def correr():
+        datos['ultimo'] = leer_excel_y_convertir(_archivo_subido(contenido, 'bench.xlsx'))
+
+    latencias = _medir(correr, repeticiones)
+    registros = sum(len(datos['ultimo'][k]) for k in ('tfn', 'tfn_cncaf', 'tfn_cncaf_csjn'))
+    return resumir(latencias, registros)
+
+
+def _caso_ingesta_chat(ruta_xlsx, repeticiones, directorio):
+    from lectores_excel import leer_excel_chat_y_convertir
+
+    with open(ruta_xlsx, 'rb') as f:
+        contenido = f.read()
+
+    datos = {}
+
+    def correr():
+        datos['ultimo'] = leer_excel_chat_y_convertir(_archivo_subido(contenido, 'bench_chat.xlsx'))
+
+    latencias = _medir(correr, repeticiones)
+    registros = sum(len(v) for v in datos['ultimo']['tribunales'].values())
+    return resumir(latencias, registros)
+
+
+def _configurar_sqlite(directorio):
+    """Apunta el almacenamiento SQLite (si está habilitado) a una base dentro del directorio temporal"""
+    import almacen_sqlite
+    almacen_sqlite.SQLITE_FILE = os.path.join(directorio, 'bench.sqlite3')
+    return almacen_sqlite
+
+
+def _preparar_datos(dataset, ruta_xlsx, directorio):
+    """Lee el workbook y guarda datos.json / chat_datos.json (o SQLite) en el directorio.
+
+    Corre fuera del proceso medido, para que el RSS de los casos de endpoints
+    no incluya la lectura del Excel con openpyxl.
+    """
+    almacen_sqlite = _configurar_sqlite(directorio)
+    with silencio(), open(ruta_xlsx, 'rb') as f:
+        contenido = f.read()
+        if dataset == 'boletin':
+            from lectores_excel import leer_excel_y_convertir
+            datos = leer_excel_y_convertir(_archivo_subido(contenido, 'bench.xlsx'))
+            guardar_sqlite, archivo_json = almacen_sqlite.guardar_boletin, 'datos.json'
+        else:
+            from lectores_excel import leer_excel_chat_y_convertir
+            datos = leer_excel_chat_y_convertir(_archivo_subido(contenido, 'bench_chat.xlsx'))
+            guardar_sqlite, archivo_json = almacen_sqlite.guardar_chat, 'chat_datos.json'
+
+    if almacen_sqlite.habilitado():
+        guardar_sqlite(datos)
+    else:
+        with open(os.path.join(directorio, archivo_json), 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+
+
+def _caso_api_datos(ruta_xlsx, repeticiones, directorio):
+    import app as app_module
+
+    _configurar_sqlite(directorio)
+    app_module.DATOS_FILE = os.path.join(directorio, 'datos.json')
+    cliente = app_module.app.test_client()
+
+    def correr():
+        respuesta = cliente.get('/api/datos')
+        assert respuesta.status_code == 200, respuesta.status_code
+
+    return resumir(_medir(correr, repeticiones))
+
+
+def _preparar_chat(directorio):
+    """Cliente de prueba apuntando a los datos del chat ya preparados en el directorio"""
+    import app as app_module
+    import chat_api
+
+    _configurar_sqlite(directorio)
+    chat_api.CHAT_DATOS_FILE = os.path.join(directorio, 'chat_datos.json')
+    return app_module.app.test_client()
+
+
+def _caso_api_chat_query(ruta_xlsx, repeticiones, directorio):
+    cliente = _preparar_chat(directorio)
+    latencias_por_consulta = {}
+
+    for consulta in CONSULTAS:
+        def correr():
+            respuesta = cliente.post('/api/chat/query', json={'query': consulta})
+            assert respuesta.status_code == 200, respuesta.status_code
+
+        latencias_por_consulta[consulta] = _medir(correr, repeticiones)
+
+    todas = [lat for lats in latencias_por_consulta.values() for lat in lats]
+    resumen = resumir(todas)
+    resumen['por_consulta'] = {
+        consulta: round(percentil(lats, 50) * 1000, 3)
+        for consulta, lats in latencias_por_consulta.items()
+    }
+    return resumen
+
+
+def _caso_api_chat_stream(ruta_xlsx, repeticiones, directorio):
+    """Latencia total del stream SSE y tiempo hasta el primer lote de resultados"""
+    cliente = _preparar_chat(directorio)
+    latencias = []
+    primeros = []
+
+    for consulta in CONSULTAS:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            respuesta = cliente.post('/api/chat/query/stream', json={'query': consulta}, buffered=False)
+            assert respuesta.status_code == 200, respuesta.status_code
+            primer_lote = None
+            for fragmento in respuesta.response:
+                if primer_lote is None and fragmento.startswith(b'event: resultados'):
+                    primer_lote = time.perf_counter() - inicio
+            latencias.append(time.perf_counter() - inicio)
+            if primer_lote is not None:
+                primeros.append(primer_lote)
+
+    resumen = resumir(latencias)
+    if primeros:
+        resumen['primer_resultado_p50_ms'] = round(percentil(primeros, 50) * 1000, 3)
+        resumen['primer_resultado_p99_ms'] = round(percentil(primeros, 99) * 1000, 3)
+    return resumen
+
+
+_FUNCIONES_CASO = {
+    'ingesta_boletin': _caso_ingesta_boletin,
+    'ingesta_chat': _caso_ingesta_chat,
+    'api_datos': _caso_api_datos,
+    'api_chat_query': _caso_api_chat_query,
+    'api_chat_stream': _caso_api_chat_stream,
+}
+
+
+def _ejecutar_caso(caso, ruta_xlsx, repeticiones, directorio):
+    """Punto de entrada del proceso hijo: corre un caso y agrega el pico de RSS"""
+    rss_inicial = pico_rss_mb()
+    with silencio():
+        resultado = _FUNCIONES_CASO[caso](ruta_xlsx, repeticiones, directorio)
+    resultado['rss_inicial_mb'] = rss_inicial
+    resultado['rss_pico_mb'] = pico_rss_mb()
+    return resultado
+
+
+def ejecutar(filas, casos=None, repeticiones=5, semilla=0, aislado=True):
+    """Corre los casos pedidos para cada escala de filas y devuelve el reporte"""
+    # Import local: el generador trae openpyxl, que no debe contar en el RSS de los casos de endpoints
+    from benchmarks.generador import generar_workbook_boletin, generar_workbook_chat
+
+    casos = casos or CASOS
+    reporte = {
+        'fecha': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'repeticiones': repeticiones,
+        'almacen': os.environ.get('TFN_ALMACEN', 'json'),
+        'semilla': semilla,
+        'resultados': []
+    }
+
+    contexto = multiprocessing.get_context('spawn')
+
+    with tempfile.TemporaryDirectory(prefix='tfn_bench_') as directorio:
+        for n in filas:
+            print(f"📦 Generando workbooks sintéticos ({n} filas)...")
+            ruta_boletin = os.path.join(directorio, f"boletin_{n}.xlsx")
+            ruta_chat = os.path.join(directorio, f"chat_{n}.xlsx")
+            with open(ruta_boletin, 'wb') as f:
+                f.write(generar_workbook_boletin(n, semilla=semilla))
+            with open(ruta_chat, 'wb') as f:
+                f.write(generar_workbook_chat(n, semilla=semilla))
+
+            preparados = set()
+            for caso in casos:
+                ruta = ruta_chat if caso in ('ingesta_chat', 'api_chat_query', 'api_chat_stream') else ruta_boletin
+                dataset = DATASET_CASO.get(caso)
+                if dataset and dataset not in preparados:
+                    if aislado:
+                        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                            pool.submit(_preparar_datos, dataset, ruta, directorio).result()
+                    else:
+                        _preparar_datos(dataset, ruta, directorio)
+                    preparados.add(dataset)
+
+                print(f"⏱  {caso} ({n} filas)...")
+                if aislado:
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                        resultado = pool.submit(_ejecutar_caso, caso, ruta, repeticiones, directorio).result()
+                else:
+                    resultado = _ejecutar_caso(caso, ruta, repeticiones, directorio)
+
+                resultado.update({'caso': caso, 'filas': n})
+                reporte['resultados'].append(resultado)
+                print(f"   p50={resultado['p50_ms']}ms p99={resultado['p99_ms']}ms "
+                      f"throughput={resultado['throughput_ops_s']} ops/s rss={resultado['rss_pico_mb']}MB")
+
+    return reporte
+
+
+def comparar(base, actual):
+    """Diferencias porcentuales de p50/p99/throughput entre dos reportes"""
+    indice_base = {(r['caso'], r['filas']): r for r in base['resultados']}
+    diferencias = []
+    for resultado in actual['resultados']:
+        anterior = indice_base.get((resultado['caso'], resultado['filas']))
+        if not anterior:
+            continue
+        fila = {'caso': resultado['caso'], 'filas': resultado['filas']}
+        for metrica in ('p50_ms', 'p99_ms', 'throughput_ops_s', 'rss_pico_mb'):
+            if anterior.get(metrica) and resultado.get(metrica) is not None:
+                fila[metrica] = round((resultado[metrica] - anterior[metrica]) / anterior[metrica] * 100, 1)
+        diferencias.append(fila)
+    return diferencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks de ingesta y consultas')
+    parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000],
+                        help='Escalas a medir (cantidad total de filas por workbook)')
+    parser.add_argument('--casos', nargs='+', choices=CASOS, default=CASOS)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--almacen', choices=['json', 'sqlite'],
+                        help='Almacenamiento a medir (equivale a TFN_ALMACEN)')
+    parser.add_argument('--sin-aislar', action='store_true',
+                        help='Correr todos los casos en este proceso (el RSS deja de ser por caso)')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar el reporte')
+    parser.add_argument('--comparar', help='Reporte JSON previo contra el cual mostrar diferencias (%%)')
+    args = parser.parse_args(argv)
+
+    if args.almacen:
+        # Los procesos hijos heredan el entorno, y almacen_sqlite lo lee al importarse
+        os.environ['TFN_ALMACEN'] = args.almacen
+
+    reporte = ejecutar(args.filas, args.casos, args.repeticiones, args.semilla, not args.sin_aislar)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.salida}")
+    else:
+        print(json.dumps(reporte, ensure_ascii=False, indent=2))
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        print("📈 Diferencias vs base (%):")
+        for fila in comparar(base, reporte):
+            print(f"   {fila}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Generador de workbooks sintéticos para benchmarks y pruebas de carga"""
+import io
+import random
+import re
+from datetime import datetime, timedelta
+
+import openpyxl
+
+# Columnas que consume el dashboard (ver llenarTablaTFN/CNCAF/CSJN en index.html)
+COLUMNAS_BOLETIN = {
+    'TFN': [
+        'Caratula_TFN', 'Expediente_TFN', 'Competencia_TFN', 'Sala_TFN',
+        'Vocalia_TFN', 'Resuelve_TFN', 'Tema_TFN'
+    ],
+    'TFN_CNCAF': [
+        'Expediente_TFN', 'Competencia_TFN', 'Sala_TFN', 'Vocalia_TFN',
+        'Resuelve_TFN', 'Tema_TFN', 'Caratula_CNCAF', 'Fecha_CNCAF',
+        'Sala_CNCAF', 'Expediente_CNCAF', 'Descarga_CNCAF', 'Resuelve_CNCAF'
+    ],
+    'TFN_CNCAF_CSJN': [
+        'Caratula_CSJN', 'Fecha_CSJN', 'Resuelve_CSJN', 'Mas_Info_CSJN',
+        'Votos_CSJN', 'Descarga_CSJN', 'Expediente_CNCAF', 'Expediente_TFN'
+    ]
+}
+
+COLUMNAS_CHAT = ['Expediente', 'Caratula', 'Sala', 'Vocalia', 'Fecha', 'Tema', 'Resuelve']
+
+HOJAS_CHAT = ['TFN', 'CNCAF', 'CSJN']
+
+EMPRESAS = [
+    'EMPRESA DEMO S.A.', 'LOGISTICA DEL SUR S.R.L.', 'AGROPECUARIA PAMPA S.A.',
+    'GOMEZ JUAN CARLOS', 'TEXTIL NORTE S.A.', 'EXPORTADORA ANDINA S.A.',
+    'CONSTRUCTORA RIO S.A.', 'PEREZ MARIA LAURA'
+]
+
+ORGANISMOS = ['AFIP DGI', 'AFIP DGA', 'DGI', 'DGA']
+
+TEMAS = [
+    'IVA - Exportaciones', 'Ganancias - Prescripción', 'Honorarios regulados',
+    'Infracciones aduaneras', 'Nulidad de determinación de oficio',
+    'Apelación - Recurso de revisión', 'Impuesto a los débitos y créditos',
+    'Prescripción de la acción fiscal', 'Multa por omisión'
+]
+
+RESUELVE = [
+    'HACER LUGAR al recurso interpuesto', 'RECHAZAR el recurso de apelación',
+    'CONFIRMAR la resolución apelada', 'REVOCAR la sentencia de grado',
+    'DECLARAR la nulidad del acto', 'DECLARAR prescripta la acción',
+    'REGULAR honorarios a la representación fiscal'
+]
+
+COMPETENCIAS = ['Impositivo', 'Aduanero', 'Directo']
+
+SALAS_TFN = ['A', 'B', 'C', 'D', 'E', 'F', 'G']
+
+SALAS_CNCAF = ['I', 'II', 'III', 'IV', 'V']
+
+VOCALES = ['Dr. González', 'Dra. Fernández', 'Dr. Rodríguez', 'Dra. López', 'Dr. Martínez']
+
+
+def _fecha_aleatoria(rng, desde=2015, hasta=2024):
+    inicio = datetime(desde, 1, 1)
+    dias = (datetime(hasta, 12, 31) - inicio).days
+    return inicio + timedelta(days=rng.randrange(dias), hours=rng.randrange(8, 18))
+
+
+def _expediente(rng, prefijo=''):
+    return f"{prefijo}{rng.randrange(1000, 99999)}-{rng.choice(['I', 'A', 'D'])}"
+
+
+def _caratula(rng):
+    return f"{rng.choice(EMPRESAS)} c/ {rng.choice(ORGANISMOS)} s/ RECURSO DIRECTO"
+
+
+def _fila_boletin(rng, hoja, n):
+    exp_tfn = _expediente(rng)
+    exp_cncaf = f"{rng.randrange(1000, 99999)}/{rng.randrange(2015, 2025)}"
+    valores = {
+        'Caratula_TFN': _caratula(rng),
+        'Expediente_TFN': exp_tfn,
+        'Competencia_TFN': rng.choice(COMPETENCIAS),
+        'Sala_TFN': rng.choice(SALAS_TFN),
+        'Vocalia_TFN': rng.choice(VOCALES),
+        'Resuelve_TFN': rng.choice(RESUELVE),
+        'Tema_TFN': rng.choice(TEMAS),
+        'Caratula_CNCAF': _caratula(rng),
+        'Fecha_CNCAF': _fecha_aleatoria(rng),
+        'Sala_CNCAF': rng.choice(SALAS_CNCAF),
+        'Expediente_CNCAF': exp_cncaf,
+        'Descarga_CNCAF': f"https://example.invalid/cncaf/{n}.pdf",
+        'Resuelve_CNCAF': rng.choice(RESUELVE),
+        'Caratula_CSJN': _caratula(rng),
+        'Fecha_CSJN': _fecha_aleatoria(rng),
+        'Resuelve_CSJN': rng.choice(RESUELVE),
+        'Mas_Info_CSJN': f"Fallos {rng.randrange(300, 347)}:{rng.randrange(1, 3000)}",
+        'Votos_CSJN': 'Rosatti, Rosenkrantz, Maqueda, Lorenzetti',
+        'Descarga_CSJN': f"https://example.invalid/csjn/{n}.pdf",
+    }
+    return [valores[col] for col in COLUMNAS_BOLETIN[hoja]]
+
+
+def _anio_hoja(hoja):
+    """Año del nombre de la hoja ("TFN 2021"), o None si no lo tiene"""
+    match = re.search(r'\b(\d{4})\b', hoja)
+    return int(match.group(1)) if match else None
+
+
+def _fila_chat(rng, anio=None):
+    # Las fechas caen dentro del año de la hoja, como en los Excel reales
+    fecha = _fecha_aleatoria(rng, anio, anio) if anio else _fecha_aleatoria(rng)
+    return [
+        _expediente(rng, 'TF-'),
+        _caratula(rng),
+        rng.choice(SALAS_TFN),
+        rng.choice(VOCALES),
+        fecha,
+        rng.choice(TEMAS),
+        rng.choice(RESUELVE),
+    ]
+
+
+def _guardar(workbook):
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def generar_workbook_boletin(filas, semilla=0):
+    """Genera un .xlsx con las hojas TFN, TFN_CNCAF y TFN_CNCAF_CSJN.
+
+    `filas` es el total aproximado de registros, repartido entre las tres hojas.
+    Devuelve el contenido del archivo en bytes.
+    """
+    rng = random.Random(semilla)
+    workbook = openpyxl.Workbook(write_only=True)
+    por_hoja = max(1, filas // len(COLUMNAS_BOLETIN))
+
+    for hoja, columnas in COLUMNAS_BOLETIN.items():
+        sheet = workbook.create_sheet(hoja)
+        sheet.append(columnas)
+        for n in range(por_hoja):
+            sheet.append(_fila_boletin(rng, hoja, n))
+
+    return _guardar(workbook)
+
+
+def generar_workbook_chat(filas, hojas=None, semilla=0):
+    """Genera un .xlsx multi-hoja para el chat (una hoja por tribunal/año).
+
+    Devuelve el contenido del archivo en bytes.
+    """
+    rng = random.Random(semilla)
+    hojas = hojas or [f"{tribunal} {anio}" for tribunal in HOJAS_CHAT for anio in (2021, 2022, 2023)]
+    workbook = openpyxl.Workbook(write_only=True)
+    por_hoja = max(1, filas // len(hojas))
+
+    for hoja in hojas:
+        sheet = workbook.create_sheet(hoja)
+        sheet.append(COLUMNAS_CHAT)
+        anio = _anio_hoja(hoja)
+        for _ in range(por_hoja):
+            sheet.append(_fila_chat(rng, anio))
+
+    return _guardar(workbook)
+
+
+def guardar_workbook(contenido, ruta):
+    """Escribe en disco el contenido generado por las funciones anteriores"""
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    return ruta
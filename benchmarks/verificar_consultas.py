@@ -0,0 +1,102 @@
+"""Verifica el compilador de consultas contra el parser original.
+
+Corre el corpus de `benchmarks/consultas.py` por el `parse_query_basico`
+previo al compilador (copiado acá tal cual) y por `extraer_filtros`. Las
+consultas deben dar los mismos filtros, salvo las listadas en
+CAMBIOS_ESPERADOS, cuyo resultado nuevo se fija explícitamente.
+
+    python -m benchmarks.verificar_consultas
+
+Sale con código 1 si alguna consulta no coincide.
+"""
+import re
+import sys
+from datetime import date
+
+from benchmarks.consultas import CONSULTAS
+from compilador_consultas import extraer_filtros, normalizar_texto
+
+# Fecha fija para que los períodos relativos ("último año") sean reproducibles
+HOY = date(2024, 6, 15)
+
+
+def parse_query_original(query_text):
+    """parse_query_basico tal como estaba antes de compilador_consultas"""
+    query_lower = query_text.lower()
+    filtros = {}
+
+    exp_pattern = r'(?:expediente|exp\.?|tf)\s*[-\s]*(\d+[-/]\w*)'
+    exp_match = re.search(exp_pattern, query_lower)
+    if exp_match:
+        filtros['expediente'] = exp_match.group(1)
+
+    year_pattern = r'\b(20\d{2})\b'
+    year_match = re.search(year_pattern, query_text)
+    if year_match:
+        filtros['año'] = int(year_match.group(1))
+
+    sala_pattern = r'sala\s*([a-g]|[1-7])'
+    sala_match = re.search(sala_pattern, query_lower)
+    if sala_match:
+        filtros['sala'] = sala_match.group(1).upper()
+
+    if 'tfn' in query_lower or 'tribunal fiscal' in query_lower:
+        filtros['tribunal'] = 'TFN'
+    elif 'cncaf' in query_lower or 'cámara' in query_lower:
+        filtros['tribunal'] = 'CNCAF'
+    elif 'csjn' in query_lower or 'corte suprema' in query_lower:
+        filtros['tribunal'] = 'CSJN'
+
+    temas = {
+        'prescripción': ['prescripcion', 'prescripc'],
+        'honorarios': ['honorario'],
+        'infracciones': ['infraccion', 'infrac'],
+        'nulidad': ['nulidad'],
+        'apelación': ['apelacion', 'recurso']
+    }
+
+    for tema, keywords in temas.items():
+        if any(keyword in query_lower for keyword in keywords):
+            filtros['tema'] = tema
+            break
+
+    return filtros
+
+
+CAMBIOS_ESPERADOS = {
+    # El año que forma parte del número de expediente ya no se toma como filtro de año
+    "exp. 4521/2020": {'expediente': '4521/2020'},
+    # Se reconocen varios valores (antes sólo el primero o el último)
+    "sala A y B sobre nulidad o honorarios": {'sala': ['A', 'B'], 'tema': ['nulidad', 'honorarios']},
+    # Rangos de años y varios tribunales
+    "tfn y csjn entre 2019 y 2021": {'tribunal': ['TFN', 'CSJN'], 'año_desde': 2019, 'año_hasta': 2021},
+    "prescripcion desde 2020": {'tema': 'prescripción', 'año_desde': 2020},
+    # Mes y períodos relativos (antes se ignoraban o quedaba sólo el año)
+    "fallos de marzo de 2022": {'mes': '2022-03'},
+    "sentencias del último año": {'fecha_desde': '2023-06-15', 'fecha_hasta': '2024-06-15'},
+    "últimos 6 meses sala A": {'fecha_desde': '2023-12-15', 'fecha_hasta': '2024-06-15', 'sala': 'A'},
+}
+
+
+def verificar():
+    """Lista de (consulta, esperado, obtenido) que no coinciden"""
+    fallas = []
+    for consulta in CONSULTAS:
+        esperado = CAMBIOS_ESPERADOS.get(consulta, parse_query_original(consulta))
+        obtenido = extraer_filtros(normalizar_texto(consulta), HOY)
+        if obtenido != esperado:
+            fallas.append((consulta, esperado, obtenido))
+    return fallas
+
+
+def main():
+    fallas = verificar()
+    for consulta, esperado, obtenido in fallas:
+        print(f"❌ {consulta!r}: esperado {esperado}, obtenido {obtenido}")
+    if fallas:
+        sys.exit(1)
+    print(f"✅ {len(CONSULTAS)} consultas coinciden ({len(CAMBIOS_ESPERADOS)} con cambios esperados)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,13 @@
-from flask import Blueprint, request, jsonify, render_template_string
+from flask import Blueprint, Response, request, jsonify, render_template_string
 import json
 import os
 from datetime import datetime
-import re
-import openpyxl
-import io
-import traceback
+
+import almacen_sqlite
+import estaticos
+import ingesta
+from compilador_consultas import PlanConsulta, compilar_consulta, describir_filtro, describir_periodo
+from indice_fechas import construir_indices, separar_fechas
 
 # Crear blueprint para el chat
 chat_bp = Blueprint('chat', __name__)
@@ -13,235 +15,79 @@ chat_bp = Blueprint('chat', __name__)
 # Archivo de datos independiente del chat
 CHAT_DATOS_FILE = 'chat_datos.json'
 
-def cargar_datos_chat():
-    """Cargar datos específicos del chat (independientes del boletín)"""
+# Streaming (SSE): filas por evento 'resultados' y máximo de filas enviadas por consulta
+TAMANO_LOTE_STREAM = 10
+LIMITE_STREAM = 50
+
+# Última versión cargada: (clave del archivo, datos, índices de fechas por hoja)
+_cache_chat = (None, None, None)
+
+def cargar_datos_chat_indexados():
+    """Cargar datos del chat junto con sus índices de fechas.
+
+    El JSON sólo se vuelve a leer cuando cambia el archivo (mtime/tamaño).
+    """
+    global _cache_chat
     try:
         if not os.path.exists(CHAT_DATOS_FILE):
-            return None
+            return None, None
+        
+        estado = os.stat(CHAT_DATOS_FILE)
+        clave = (CHAT_DATOS_FILE, estado.st_mtime_ns, estado.st_size)
+        if _cache_chat[0] != clave:
+            with open(CHAT_DATOS_FILE, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            tablas = datos.get('tribunales', {})
+            _cache_chat = (clave, datos, construir_indices(tablas, separar_fechas(datos, tablas)))
         
-        with open(CHAT_DATOS_FILE, 'r', encoding='utf-8') as f:
-            datos = json.load(f)
-        return datos
+        return _cache_chat[1], _cache_chat[2]
     except Exception as e:
         print(f"Error cargando datos del chat: {e}")
-        return None
+        return None, None
 
-def leer_excel_chat_y_convertir(archivo_excel):
-    """Convertir Excel del chat a formato JSON - VERSIÓN CORREGIDA"""
-    try:
-        print(f"🔍 Chat: Procesando archivo: {archivo_excel.filename}")
-        
-        archivo_excel.seek(0)
-        file_content = archivo_excel.read()
-        excel_buffer = io.BytesIO(file_content)
-        
-        print("📖 Chat: Cargando workbook...")
-        workbook = openpyxl.load_workbook(excel_buffer, data_only=True)
-        
-        datos_chat = {
-            'fecha_carga': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'tribunales': {}
-        }
-        
-        print(f"📊 Chat: Hojas encontradas: {workbook.sheetnames}")
-        
-        # Procesar cada hoja como tribunal independiente
-        for sheet_name in workbook.sheetnames:
-            print(f"📄 Chat: Procesando hoja: {sheet_name}")
-            sheet = workbook[sheet_name]
-            
-            # Leer headers (primera fila) - MANERA SEGURA
-            headers = []
-            for cell in sheet[1]:
-                if cell.value is None:
-                    headers.append('')
-                else:
-                    try:
-                        headers.append(str(cell.value).strip())
-                    except:
-                        headers.append('')
-            
-            print(f"📋 Chat: Headers para {sheet_name}: {headers}")
-            
-            # Leer datos (desde fila 2) - MANERA SEGURA
-            sheet_data = []
-            row_count = 0
-            
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                row_count += 1
-                # Verificar si la fila tiene datos
-                if any(cell is not None for cell in row):
-                    row_dict = {}
-                    for i, value in enumerate(row):
-                        if i < len(headers) and headers[i]:
-                            # Convertir valor de manera segura
-                            if value is None:
-                                row_dict[headers[i]] = ''
-                            elif isinstance(value, datetime):
-                                row_dict[headers[i]] = value.strftime('%Y-%m-%d')
-                            else:
-                                try:
-                                    row_dict[headers[i]] = str(value)
-                                except:
-                                    row_dict[headers[i]] = ''
-                    
-                    if row_dict:  # Solo agregar si tiene datos
-                        sheet_data.append(row_dict)
-            
-            if sheet_data:
-                datos_chat['tribunales'][sheet_name] = sheet_data
-                print(f"✅ Chat: {sheet_name}: {len(sheet_data)} registros")
-        
-        print(f"🎉 Chat: Procesamiento completado. Total hojas: {len(datos_chat['tribunales'])}")
-        return datos_chat
-        
-    except Exception as e:
-        print(f"❌ Error detallado en chat: {str(e)}")
-        print(f"📝 Stack trace: {traceback.format_exc()}")
-        raise Exception(f"Error procesando Excel del chat: {str(e)}")
+def cargar_datos_chat():
+    """Cargar datos específicos del chat (independientes del boletín)"""
+    return cargar_datos_chat_indexados()[0]
 
-def parse_query_basico(query_text):
-    """Parser básico para extraer filtros de consultas en lenguaje natural"""
-    query_lower = query_text.lower()
-    filtros = {}
-    
-    # Detectar expediente
-    exp_pattern = r'(?:expediente|exp\.?|tf)\s*[-\s]*(\d+[-/]\w*)'
-    exp_match = re.search(exp_pattern, query_lower)
-    if exp_match:
-        filtros['expediente'] = exp_match.group(1)
+def resumen_datos_chat():
+    """Fecha de carga y registros por hoja según el almacenamiento configurado (None si no hay datos)"""
+    if almacen_sqlite.habilitado():
+        return almacen_sqlite.resumen_chat()
     
-    # Detectar año
-    year_pattern = r'\b(20\d{2})\b'
-    year_match = re.search(year_pattern, query_text)
-    if year_match:
-        filtros['año'] = int(year_match.group(1))
-    
-    # Detectar sala
-    sala_pattern = r'sala\s*([a-g]|[1-7])'
-    sala_match = re.search(sala_pattern, query_lower)
-    if sala_match:
-        filtros['sala'] = sala_match.group(1).upper()
-    
-    # Detectar tribunal
-    if 'tfn' in query_lower or 'tribunal fiscal' in query_lower:
-        filtros['tribunal'] = 'TFN'
-    elif 'cncaf' in query_lower or 'cámara' in query_lower:
-        filtros['tribunal'] = 'CNCAF'
-    elif 'csjn' in query_lower or 'corte suprema' in query_lower:
-        filtros['tribunal'] = 'CSJN'
-    
-    # Detectar temas comunes
-    temas = {
-        'prescripción': ['prescripcion', 'prescripc'],
-        'honorarios': ['honorario'],
-        'infracciones': ['infraccion', 'infrac'],
-        'nulidad': ['nulidad'],
-        'apelación': ['apelacion', 'recurso']
+    datos = cargar_datos_chat()
+    if not datos or 'tribunales' not in datos:
+        return None
+    return {
+        'fecha_carga': datos.get('fecha_carga'),
+        'tribunales': {tribunal: len(registros) for tribunal, registros in datos['tribunales'].items()}
     }
-    
-    for tema, keywords in temas.items():
-        if any(keyword in query_lower for keyword in keywords):
-            filtros['tema'] = tema
-            break
-    
-    return filtros
+
+def parse_query_basico(query_text):
+    """Parser básico para extraer filtros de consultas en lenguaje natural"""
+    filtros = compilar_consulta(query_text).filtros
+    # Copia para que el llamador no altere el plan cacheado
+    return {k: list(v) if isinstance(v, list) else v for k, v in filtros.items()}
 
 def filtrar_datos_chat(datos_chat, filtros):
     """Aplicar filtros a los datos del chat"""
-    if not datos_chat or 'tribunales' not in datos_chat:
-        return []
-    
-    resultados = []
-    
-    # Buscar en todas las hojas/tribunales
-    for hoja_name, registros in datos_chat['tribunales'].items():
-        for item in registros:
-            if coincide_filtros_chat(item, filtros, hoja_name):
-                item['_fuente'] = hoja_name
-                resultados.append(item)
-    
-    return resultados
+    return PlanConsulta(filtros).ejecutar(datos_chat)
 
 def coincide_filtros_chat(item, filtros, hoja_name):
     """Verificar si un item del chat coincide con los filtros"""
-    
-    # Filtro por expediente - buscar en cualquier campo que contenga "expediente"
-    if 'expediente' in filtros:
-        expediente_encontrado = False
-        for key, value in item.items():
-            if 'expediente' in key.lower() and value:
-                if filtros['expediente'].lower() in str(value).lower():
-                    expediente_encontrado = True
-                    break
-        if not expediente_encontrado:
-            return False
-    
-    # Filtro por sala - buscar en cualquier campo que contenga "sala"
-    if 'sala' in filtros:
-        sala_encontrada = False
-        for key, value in item.items():
-            if 'sala' in key.lower() and value:
-                if str(value).upper() == filtros['sala']:
-                    sala_encontrada = True
-                    break
-        if not sala_encontrada:
-            return False
-    
-    # Filtro por tema - buscar en campos de tema, carátula, resuelve
-    if 'tema' in filtros:
-        tema_encontrado = False
-        campos_tema = [key for key in item.keys() if any(x in key.lower() for x in ['tema', 'caratula', 'resuelve'])]
-        for campo in campos_tema:
-            if item.get(campo) and filtros['tema'].lower() in str(item[campo]).lower():
-                tema_encontrado = True
-                break
-        if not tema_encontrado:
-            return False
-    
-    # Filtro por año - buscar en fechas o en nombre de hoja
-    if 'año' in filtros:
-        año_encontrado = False
-        
-        # Buscar en campos de fecha
-        campos_fecha = [key for key in item.keys() if 'fecha' in key.lower()]
-        for campo in campos_fecha:
-            if item.get(campo) and str(filtros['año']) in str(item[campo]):
-                año_encontrado = True
-                break
-        
-        # Buscar en nombre de hoja
-        if not año_encontrado and str(filtros['año']) in hoja_name:
-            año_encontrado = True
-        
-        # Si no hay fechas específicas, asumir que puede coincidir
-        if not año_encontrado and not campos_fecha:
-            año_encontrado = True
-    
-    # Filtro por tribunal - buscar en nombre de hoja o campos
-    if 'tribunal' in filtros:
-        tribunal_encontrado = False
-        
-        # Buscar en nombre de hoja
-        if filtros['tribunal'].lower() in hoja_name.lower():
-            tribunal_encontrado = True
-        
-        # Buscar en campos que contengan tribunal
-        if not tribunal_encontrado:
-            campos_tribunal = [key for key in item.keys() if 'tribunal' in key.lower()]
-            for campo in campos_tribunal:
-                if item.get(campo) and filtros['tribunal'].lower() in str(item[campo]).lower():
-                    tribunal_encontrado = True
-                    break
-        
-        if not tribunal_encontrado:
-            return False
-    
-    return True
+    return PlanConsulta(filtros).coincide(item, hoja_name)
+
+def generar_respuesta_chat(query, filtros, resultados, conteo_fuentes=None):
+    """Generar respuesta conversacional para el chat
 
-def generar_respuesta_chat(query, filtros, resultados):
-    """Generar respuesta conversacional para el chat"""
-    total = len(resultados)
+    `conteo_fuentes` ({hoja: cantidad}) permite responder sin tener todos los
+    resultados en memoria (almacenamiento SQLite).
+    """
+    if conteo_fuentes is None:
+        conteo_fuentes = {}
+        for item in resultados:
+            fuente = item.get('_fuente', 'Desconocido')
+            conteo_fuentes[fuente] = conteo_fuentes.get(fuente, 0) + 1
+    total = sum(conteo_fuentes.values())
     
     if total == 0:
         return {
@@ -257,24 +103,20 @@ def generar_respuesta_chat(query, filtros, resultados):
     mensaje_parts = [f"Encontré {total} resultado{'s' if total != 1 else ''}"]
     
     if filtros.get('tribunal'):
-        mensaje_parts.append(f"en {filtros['tribunal']}")
+        mensaje_parts.append(f"en {describir_filtro(filtros['tribunal'])}")
     
     if filtros.get('tema'):
-        mensaje_parts.append(f"sobre {filtros['tema']}")
+        mensaje_parts.append(f"sobre {describir_filtro(filtros['tema'])}")
     
     if filtros.get('sala'):
-        mensaje_parts.append(f"de la sala {filtros['sala']}")
+        mensaje_parts.append(f"de la sala {describir_filtro(filtros['sala'])}")
     
-    if filtros.get('año'):
-        mensaje_parts.append(f"del año {filtros['año']}")
+    mensaje_parts.extend(describir_periodo(filtros))
     
     mensaje = " ".join(mensaje_parts) + "."
     
     # Análisis de fuentes
-    fuentes = {}
-    for item in resultados:
-        fuente = item.get('_fuente', 'Desconocido')
-        fuentes[fuente] = fuentes.get(fuente, 0) + 1
+    fuentes = conteo_fuentes
     
     analisis = []
     if len(fuentes) > 1:
@@ -294,16 +136,10 @@ def generar_respuesta_chat(query, filtros, resultados):
 @chat_bp.route('/test', methods=['GET'])
 def test_chat():
     """Endpoint de prueba para verificar funcionamiento del chat"""
-    datos = cargar_datos_chat()
+    datos = resumen_datos_chat()
     
-    total_registros = 0
-    tribunales_info = {}
-    
-    if datos and 'tribunales' in datos:
-        for tribunal, registros in datos['tribunales'].items():
-            count = len(registros)
-            tribunales_info[tribunal] = count
-            total_registros += count
+    tribunales_info = datos['tribunales'] if datos else {}
+    total_registros = sum(tribunales_info.values())
     
     return jsonify({
         "status": "ok",
@@ -329,32 +165,21 @@ def subir_datos_chat():
         if not archivo.filename.endswith(('.xlsx', '.xls')):
             return jsonify({'error': 'Solo se permiten archivos Excel (.xlsx, .xls)'}), 400
         
-        print(f"Procesando archivo del chat: {archivo.filename}")
-        
-        # Procesar Excel específico del chat
-        datos_chat = leer_excel_chat_y_convertir(archivo)
-        
-        # Guardar en archivo JSON del chat
-        with open(CHAT_DATOS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(datos_chat, f, ensure_ascii=False, indent=2)
-        
-        print("Datos del chat guardados correctamente")
+        print(f"Archivo del chat recibido: {archivo.filename}")
         
-        # Calcular estadísticas
-        total_registros = sum(len(registros) for registros in datos_chat['tribunales'].values())
-        
-        return jsonify({
-            'mensaje': 'Datos del chat procesados exitosamente',
-            'fecha_carga': datos_chat['fecha_carga'],
-            'total_registros': total_registros,
-            'tribunales_cargados': list(datos_chat['tribunales'].keys()),
-            'detalle_por_tribunal': {k: len(v) for k, v in datos_chat['tribunales'].items()}
-        })
+        # La lectura del Excel corre en un proceso de ingesta aparte (ver ingesta.py)
+        codigo, trabajo = ingesta.programar('chat', archivo.read(), archivo.filename, CHAT_DATOS_FILE)
+        return ingesta.respuesta_carga('chat', codigo, trabajo, '/api/chat/upload/estado')
         
     except Exception as e:
         print(f"Error en subir_datos_chat: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@chat_bp.route('/upload/estado', methods=['GET'])
+def estado_subida_chat():
+    """Estado de una carga del chat (?id=...) o de la carga en curso"""
+    return ingesta.respuesta_estado('chat')
+
 @chat_bp.route('/query', methods=['POST'])
 def procesar_consulta_chat():
     """Endpoint principal para procesar consultas del chat"""
@@ -375,28 +200,36 @@ def procesar_consulta_chat():
                 "error": "La consulta no puede estar vacía"
             }), 400
         
-        # Cargar datos del chat
-        datos_chat = cargar_datos_chat()
-        if not datos_chat:
+        # Procesar consulta con el plan compilado (cacheado por texto normalizado)
+        plan = compilar_consulta(query)
+        filtros = plan.filtros
+        
+        # Cargar datos del chat y ejecutar el plan
+        if almacen_sqlite.habilitado():
+            resultado = almacen_sqlite.consultar_chat(plan)
+        else:
+            datos_chat, indices = cargar_datos_chat_indexados()
+            resultado = plan.consultar(datos_chat, indices) if datos_chat else None
+        
+        if resultado is None:
             return jsonify({
                 "success": False,
                 "error": "No hay datos del chat disponibles. Carga un archivo Excel primero."
             }), 404
         
-        # Procesar consulta
-        filtros = parse_query_basico(query)
-        resultados = filtrar_datos_chat(datos_chat, filtros)
-        respuesta = generar_respuesta_chat(query, filtros, resultados)
+        conteos, resultados = resultado
+        respuesta = generar_respuesta_chat(query, filtros, resultados, conteos)
+        total = sum(conteos.values())
         
         # Preparar respuesta
         response_data = {
             "success": True,
             "query": query,
             "filtros_detectados": filtros,
-            "total_resultados": len(resultados),
+            "total_resultados": total,
             "respuesta": respuesta,
-            "datos": resultados[:10] if len(resultados) <= 10 else resultados[:5],
-            "hay_mas_resultados": len(resultados) > 10
+            "datos": resultados[:10] if total <= 10 else resultados[:5],
+            "hay_mas_resultados": total > 10
         }
         
         return jsonify(response_data)
@@ -407,25 +240,130 @@ def procesar_consulta_chat():
             "error": f"Error procesando consulta del chat: {str(e)}"
         }), 500
 
+def _evento_sse(nombre, datos):
+    """Serializa un evento Server-Sent Events"""
+    return f"event: {nombre}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n"
+
+@chat_bp.route('/query/stream', methods=['GET', 'POST'])
+def procesar_consulta_chat_stream():
+    """Versión en streaming (Server-Sent Events) de /query.
+    
+    Emite, en orden:
+      - 'filtros': filtros detectados y una estimación de la cantidad de resultados
+      - 'resultados': lotes de filas (las más recientes primero) a medida que se encuentran
+      - 'resumen': total, respuesta de generar_respuesta_chat y si quedaron filas sin enviar
+    Acepta la consulta como JSON ({"query": ...}) o como ?query= para EventSource.
+    """
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({
+            "success": False,
+            "error": "El cuerpo JSON debe ser un objeto con el campo 'query'"
+        }), 400
+    query = str(data.get('query') or request.args.get('query') or '').strip()
+    
+    if not query:
+        return jsonify({
+            "success": False,
+            "error": "Se requiere el campo 'query' en el request"
+        }), 400
+    
+    try:
+        limite = int(data.get('limite') or request.args.get('limite') or LIMITE_STREAM)
+    except (TypeError, ValueError):
+        limite = LIMITE_STREAM
+    limite = max(1, min(limite, LIMITE_STREAM))
+    
+    try:
+        plan = compilar_consulta(query)
+        
+        if almacen_sqlite.habilitado():
+            estimacion = almacen_sqlite.estimar_chat(plan)
+            datos_chat = indices = None
+        else:
+            datos_chat, indices = cargar_datos_chat_indexados()
+            estimacion = plan.estimar(datos_chat, indices) if datos_chat else None
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": f"Error procesando consulta del chat: {str(e)}"
+        }), 500
+    
+    if estimacion is None:
+        return jsonify({
+            "success": False,
+            "error": "No hay datos del chat disponibles. Carga un archivo Excel primero."
+        }), 404
+    
+    def generar():
+        try:
+            yield _evento_sse('filtros', {
+                "query": query,
+                "filtros_detectados": plan.filtros,
+                "estimacion_resultados": estimacion
+            })
+            
+            if almacen_sqlite.habilitado():
+                iterador = ((item['_fuente'], item) for item in almacen_sqlite.iterar_chat(plan, limite))
+            else:
+                iterador = plan.coincidencias(datos_chat, indices, recientes_primero=True)
+            
+            enviados = []
+            lote = []
+            conteos = {}
+            for hoja, item in iterador:
+                conteos[hoja] = conteos.get(hoja, 0) + 1
+                if len(enviados) < limite:
+                    # Copia: las filas cacheadas no se modifican
+                    item = dict(item, _fuente=hoja)
+                    enviados.append(item)
+                    lote.append(item)
+                    if len(lote) == TAMANO_LOTE_STREAM:
+                        yield _evento_sse('resultados', {"datos": lote, "enviados": len(enviados)})
+                        lote = []
+            if lote:
+                yield _evento_sse('resultados', {"datos": lote, "enviados": len(enviados)})
+            
+            # En SQLite el iterador corta en `limite`; el total se cuenta aparte
+            if almacen_sqlite.habilitado():
+                conteos = almacen_sqlite.consultar_chat(plan, limite=0)[0]
+            
+            total = sum(conteos.values())
+            yield _evento_sse('resumen', {
+                "success": True,
+                "total_resultados": total,
+                "respuesta": generar_respuesta_chat(query, plan.filtros, enviados, conteos),
+                "hay_mas_resultados": total > len(enviados)
+            })
+        except Exception as e:
+            print(f"Error en procesar_consulta_chat_stream: {str(e)}")
+            yield _evento_sse('error', {
+                "success": False,
+                "error": f"Error procesando consulta del chat: {str(e)}"
+            })
+    
+    return Response(generar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @chat_bp.route('/status', methods=['GET'])
 def status_chat():
     """Estado del sistema de chat independiente"""
-    datos = cargar_datos_chat()
+    datos = resumen_datos_chat()
     
     status_info = {
         "chat_enabled": True,
         "data_last_update": datos.get('fecha_carga') if datos else None,
-        "sistema": "independiente_del_boletin"
+        "sistema": "independiente_del_boletin",
+        "almacenamiento": almacen_sqlite.ALMACEN
     }
     
-    if datos and 'tribunales' in datos:
-        status_info["tribunales_disponibles"] = {
-            tribunal: len(registros) 
-            for tribunal, registros in datos['tribunales'].items()
-        }
-        status_info["total_registros"] = sum(
-            len(registros) for registros in datos['tribunales'].values()
-        )
+    if datos:
+        status_info["tribunales_disponibles"] = datos['tribunales']
+        status_info["total_registros"] = sum(datos['tribunales'].values())
     else:
         status_info["tribunales_disponibles"] = {}
         status_info["total_registros"] = 0
@@ -435,13 +373,15 @@ def status_chat():
         "Filtro por tema: 'sentencias sobre prescripción'",
         "Filtro por sala: 'casos de la sala G'",
         "Filtro por año: 'sentencias de 2023'",
+        "Rangos de años: 'sentencias entre 2019 y 2021'",
+        "Períodos: 'fallos de marzo de 2022', 'sentencias del último año'",
+        "Varios valores: 'sala A y B sobre nulidad o honorarios'",
         "Combinaciones: 'casos de prescripción sala G 2023'"
     ]
     
     return jsonify(status_info)
 
-@chat_bp.route('/admin', methods=['GET'])
-def admin_chat():
+def _pagina_admin_chat():
     """Página de administración específica del chat"""
     return render_template_string('''
     <!DOCTYPE html>
@@ -483,6 +423,27 @@ def admin_chat():
         </div>
         
         <script>
+            function esperarCarga(urlEstado, statusDiv, mostrarResultado) {
+                fetch(urlEstado)
+                .then(response => response.json())
+                .then(trabajo => {
+                    if (trabajo.estado === 'completada') {
+                        mostrarResultado(trabajo.resultado);
+                    } else if (trabajo.estado === 'error' || trabajo.error) {
+                        statusDiv.innerHTML = `<div class="error">Error: ${trabajo.error}</div>`;
+                    } else if (trabajo.estado === 'reemplazada') {
+                        statusDiv.innerHTML = '<div class="error">La carga fue reemplazada por otra más reciente</div>';
+                    } else {
+                        const texto = trabajo.estado === 'encolada' ? 'En espera: hay otra carga en curso...' : 'Procesando datos del chat...';
+                        statusDiv.innerHTML = `<div class="info">${texto}</div>`;
+                        setTimeout(() => esperarCarga(urlEstado, statusDiv, mostrarResultado), 1000);
+                    }
+                })
+                .catch(error => {
+                    statusDiv.innerHTML = `<div class="error">Error de conexión: ${error}</div>`;
+                });
+            }
+
             function subirArchivo() {
                 const fileInput = document.getElementById('fileInput');
                 const statusDiv = document.getElementById('status');
@@ -505,14 +466,21 @@ def admin_chat():
                 .then(data => {
                     if (data.error) {
                         statusDiv.innerHTML = `<div class="error">Error: ${data.error}</div>`;
-                    } else {
+                        return;
+                    }
+                    fileInput.value = '';
+                    const mostrarResultado = data => {
                         statusDiv.innerHTML = `<div class="success">
                             ✓ Datos del chat cargados exitosamente<br>
                             Fecha: ${data.fecha_carga}<br>
                             Total registros: ${data.total_registros}<br>
                             Tribunales: ${data.tribunales_cargados.join(', ')}
                         </div>`;
-                        fileInput.value = '';
+                    };
+                    if (data.url_estado) {
+                        esperarCarga(data.url_estado, statusDiv, mostrarResultado);
+                    } else {
+                        mostrarResultado(data);
                     }
                 })
                 .catch(error => {
@@ -522,4 +490,11 @@ def admin_chat():
         </script>
     </body>
     </html>
-    ''')
\ No newline at end of file
+    ''')
+
+estaticos.registrar('admin_chat', _pagina_admin_chat)
+
+@chat_bp.route('/admin', methods=['GET'])
+def admin_chat():
+    """Página de administración específica del chat (renderizada una sola vez)"""
+    return estaticos.servir('admin_chat')
@@ -0,0 +1,508 @@
+"""Compilador de consultas del chat.
+
+Convierte el texto libre de una consulta en un plan ejecutable:
+
+1. Normaliza el texto una sola vez (minúsculas, sin acentos, espacios simples).
+2. Tokeniza en una única pasada con un patrón combinado precompilado.
+3. Arma los filtros (admitiendo varios valores por filtro y rangos de años).
+4. Ordena los pasos del plan por selectividad estimada y los especializa por
+   hoja, resolviendo de antemano qué columnas inspecciona cada filtro.
+
+Los filtros de fecha (años, rangos, meses, "último año") se reducen a
+intervalos de ordinales que se resuelven con el índice de `indice_fechas`.
+
+Los planes se cachean por texto normalizado (y por el día de hoy, ya que
+"último año" es relativo), de modo que "prescripción" y "Prescripcion"
+comparten el mismo plan.
+"""
+import heapq
+import re
+from calendar import monthrange
+from datetime import date, timedelta
+from functools import lru_cache
+
+from indice_fechas import (
+    IndiceFechas,
+    intersectar_intervalos,
+    intervalo_anio,
+    ordinal_de_registro,
+    unir_intervalos,
+)
+
+# Normalización de acentos con una tabla de traducción (mucho más barata que unicodedata)
+_SIN_ACENTOS = str.maketrans('áéíóúüñàèìòùâêîôû', 'aeiouunaeiouaeiou')
+
+# Temas reconocidos y los prefijos que los disparan
+TEMAS = {
+    'prescripción': ['prescripcion', 'prescripc'],
+    'honorarios': ['honorario'],
+    'infracciones': ['infraccion', 'infrac'],
+    'nulidad': ['nulidad'],
+    'apelación': ['apelacion', 'recurso']
+}
+
+# Frases que identifican a cada tribunal
+TRIBUNALES = {
+    'TFN': ['tfn', 'tribunal fiscal'],
+    'CNCAF': ['cncaf', 'camara'],
+    'CSJN': ['csjn', 'corte suprema']
+}
+
+MESES = [
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+    'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
+]
+
+# Fracción estimada de filas que sobrevive a cada filtro con un único valor
+_SELECTIVIDAD = {
+    'expediente': 0.001,
+    'sala': 0.15,
+    'fecha': 0.1,
+    'tema': 0.2,
+    'tribunal': 0.35
+}
+
+# Días que cubre un corpus típico, para estimar la selectividad de un rango de fechas
+_DIAS_CORPUS = 3650
+
+_TODAS_LAS_FECHAS = [(1, date.max.toordinal())]
+
+_ANIO = r'(?:19|20)\d{2}'
+_SALA = r'(?:[a-g]|[1-7])'
+
+_LISTA_TEMAS = list(TEMAS)
+_LISTA_TRIBUNALES = list(TRIBUNALES)
+
+
+def _alternativas(palabras):
+    return '|'.join(re.escape(p).replace(r'\ ', r'\s+') for p in sorted(palabras, key=len, reverse=True))
+
+
+_PATRON_CONSULTA = re.compile(
+    r'(?P<expediente>(?:expediente|exp\.?|tf)\s*[-\s]*(?P<exp>\d+[-/]\w*))'
+    rf'|\b(?P<mes_nombre>{"|".join(MESES)}|setiembre)\s+(?:de(?:l)?\s+)?(?P<mes>{_ANIO})\b'
+    r'|\bultim[oa]s?\s+(?:(?P<cantidad>\d+)\s+)?(?P<periodo>anos?|mes(?:es)?|semanas?|dias?)\b'
+    r'|\b(?P<este_ano>este\s+ano|ano\s+actual)\b'
+    rf'|\b(?:entre|de|del)\s+(?:los\s+)?(?:anos\s+)?(?P<entre_desde>{_ANIO})\s+(?:y|a|al|hasta)\s+(?P<entre_hasta>{_ANIO})\b'
+    rf'|\b(?P<guion_desde>{_ANIO})\s*-\s*(?P<guion_hasta>{_ANIO})\b'
+    rf'|\b(?:desde|a\s+partir\s+de|posteriores?\s+a)\s+(?:el\s+)?(?P<desde>{_ANIO})\b'
+    rf'|\b(?:hasta|anteriores?\s+a)\s+(?:el\s+)?(?P<hasta>{_ANIO})\b'
+    rf'|\b(?P<anio>{_ANIO})\b'
+    rf'|\bsalas?\s*(?P<sala>{_SALA}(?:\s*(?:,|y|o)\s*{_SALA})*)\b'
+    + ''.join(
+        rf'|\b(?P<tribunal_{i}>{_alternativas(TRIBUNALES[t])})\b'
+        for i, t in enumerate(_LISTA_TRIBUNALES)
+    )
+    + ''.join(
+        rf'|(?P<tema_{i}>{_alternativas(TEMAS[t])})'
+        for i, t in enumerate(_LISTA_TEMAS)
+    )
+)
+
+_PATRON_SALAS = re.compile(_SALA)
+
+_PATRON_ANIO = re.compile(_ANIO)
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin acentos y con espacios simples"""
+    return ' '.join(str(texto).lower().translate(_SIN_ACENTOS).split())
+
+
+@lru_cache(maxsize=65536)
+def _plegar(texto):
+    """Minúsculas y sin acentos; memoizado porque temas y resoluciones se repiten mucho"""
+    return texto.lower().translate(_SIN_ACENTOS)
+
+
+def _agregar(filtros, clave, valor):
+    """Agrega un valor a un filtro: escalar si es el primero, lista si hay varios"""
+    if clave not in filtros:
+        filtros[clave] = valor
+        return
+    actual = filtros[clave] if isinstance(filtros[clave], list) else [filtros[clave]]
+    if valor not in actual:
+        filtros[clave] = actual + [valor]
+
+
+def valores(filtros, clave):
+    """Devuelve los valores de un filtro siempre como lista"""
+    valor = filtros.get(clave)
+    if valor is None:
+        return []
+    return valor if isinstance(valor, list) else [valor]
+
+
+def _restar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 - meses
+    anio, mes = divmod(total, 12)
+    return date(anio, mes + 1, min(fecha.day, monthrange(anio, mes + 1)[1]))
+
+
+def _periodo_relativo(hoy, cantidad, periodo):
+    """Fecha de inicio de "últimos N días/semanas/meses/años" contando hacia atrás desde hoy.
+
+    Si el período va más atrás del año 1 se toma `date.min`.
+    """
+    try:
+        if periodo.startswith('dia'):
+            return hoy - timedelta(days=cantidad)
+        if periodo.startswith('semana'):
+            return hoy - timedelta(weeks=cantidad)
+        if periodo.startswith('mes'):
+            return _restar_meses(hoy, cantidad)
+        return _restar_meses(hoy, 12 * cantidad)
+    except (OverflowError, ValueError):
+        return date.min
+
+
+def _rango(filtros, desde, hasta):
+    if desde is not None and hasta is not None and desde > hasta:
+        desde, hasta = hasta, desde
+    if desde is not None:
+        filtros['año_desde'] = max(desde, filtros.get('año_desde', desde))
+    if hasta is not None:
+        filtros['año_hasta'] = min(hasta, filtros.get('año_hasta', hasta))
+
+
+def extraer_filtros(texto_normalizado, hoy=None):
+    """Tokeniza el texto normalizado en una sola pasada y arma el dict de filtros"""
+    hoy = hoy or date.today()
+    filtros = {}
+
+    for match in _PATRON_CONSULTA.finditer(texto_normalizado):
+        grupo = match.lastgroup
+        if grupo == 'expediente':
+            _agregar(filtros, 'expediente', match.group('exp'))
+        elif grupo == 'mes':
+            nombre = match.group('mes_nombre')
+            numero = 9 if nombre == 'setiembre' else MESES.index(nombre) + 1
+            _agregar(filtros, 'mes', f"{match.group('mes')}-{numero:02d}")
+        elif grupo == 'periodo':
+            cantidad = int(match.group('cantidad') or 1)
+            filtros['fecha_desde'] = _periodo_relativo(hoy, cantidad, match.group('periodo')).isoformat()
+            filtros['fecha_hasta'] = hoy.isoformat()
+        elif grupo == 'este_ano':
+            _agregar(filtros, 'año', hoy.year)
+        elif grupo == 'entre_hasta':
+            _rango(filtros, int(match.group('entre_desde')), int(match.group('entre_hasta')))
+        elif grupo == 'guion_hasta':
+            _rango(filtros, int(match.group('guion_desde')), int(match.group('guion_hasta')))
+        elif grupo == 'desde':
+            _rango(filtros, int(match.group('desde')), None)
+        elif grupo == 'hasta':
+            _rango(filtros, None, int(match.group('hasta')))
+        elif grupo == 'anio':
+            _agregar(filtros, 'año', int(match.group('anio')))
+        elif grupo == 'sala':
+            for sala in _PATRON_SALAS.findall(match.group('sala')):
+                _agregar(filtros, 'sala', sala.upper())
+        elif grupo.startswith('tribunal_'):
+            _agregar(filtros, 'tribunal', _LISTA_TRIBUNALES[int(grupo[len('tribunal_'):])])
+        elif grupo.startswith('tema_'):
+            _agregar(filtros, 'tema', _LISTA_TEMAS[int(grupo[len('tema_'):])])
+
+    return filtros
+
+
+def _campos(claves, *fragmentos):
+    return [c for c in claves if any(f in c.lower() for f in fragmentos)]
+
+
+def _anio_de(valor):
+    match = _PATRON_ANIO.search(str(valor))
+    return int(match.group(0)) if match else None
+
+
+def _intervalo_iso(desde, hasta):
+    return (
+        date.fromisoformat(desde).toordinal() if desde else 1,
+        date.fromisoformat(hasta).toordinal() if hasta else date.max.toordinal()
+    )
+
+
+def _intervalo_mes(texto):
+    anio, mes = (int(parte) for parte in texto.split('-'))
+    siguiente = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+    return (date(anio, mes, 1).toordinal(), siguiente.toordinal() - 1)
+
+
+def intervalos_fecha(filtros):
+    """Reduce los filtros de fecha a una lista de intervalos de ordinales.
+
+    Devuelve None si la consulta no filtra por fecha. Los distintos filtros
+    se intersectan entre sí; los valores de un mismo filtro se unen.
+    """
+    intervalos = _TODAS_LAS_FECHAS
+    activo = False
+
+    anios = valores(filtros, 'año')
+    if anios:
+        intervalos = intersectar_intervalos(intervalos, unir_intervalos(intervalo_anio(a) for a in anios))
+        activo = True
+
+    if 'año_desde' in filtros or 'año_hasta' in filtros:
+        desde = filtros.get('año_desde')
+        hasta = filtros.get('año_hasta')
+        rango = (intervalo_anio(desde)[0] if desde else 1, intervalo_anio(hasta)[1] if hasta else date.max.toordinal())
+        intervalos = intersectar_intervalos(intervalos, [rango])
+        activo = True
+
+    meses = valores(filtros, 'mes')
+    if meses:
+        intervalos = intersectar_intervalos(intervalos, unir_intervalos(_intervalo_mes(m) for m in meses))
+        activo = True
+
+    if 'fecha_desde' in filtros or 'fecha_hasta' in filtros:
+        intervalos = intersectar_intervalos(
+            intervalos, [_intervalo_iso(filtros.get('fecha_desde'), filtros.get('fecha_hasta'))]
+        )
+        activo = True
+
+    return intervalos if activo else None
+
+
+def describir_periodo(filtros):
+    """Frases legibles de los filtros de fecha, para armar la respuesta del chat"""
+    partes = []
+    if filtros.get('año'):
+        partes.append(f"del año {describir_filtro(filtros['año'])}")
+    if filtros.get('año_desde') and filtros.get('año_hasta'):
+        partes.append(f"entre {filtros['año_desde']} y {filtros['año_hasta']}")
+    elif filtros.get('año_desde'):
+        partes.append(f"desde {filtros['año_desde']}")
+    elif filtros.get('año_hasta'):
+        partes.append(f"hasta {filtros['año_hasta']}")
+    if filtros.get('mes'):
+        nombres = [f"{MESES[int(m[5:]) - 1]} de {m[:4]}" for m in valores(filtros, 'mes')]
+        partes.append(f"de {describir_filtro(nombres if len(nombres) > 1 else nombres[0])}")
+    if filtros.get('fecha_desde') or filtros.get('fecha_hasta'):
+        partes.append(f"entre {filtros.get('fecha_desde', 'el inicio')} y {filtros.get('fecha_hasta', 'hoy')}")
+    return partes
+
+
+class PlanConsulta:
+    """Plan ejecutable: filtros originales más los pasos ordenados por selectividad"""
+
+    def __init__(self, filtros):
+        self.filtros = filtros
+        self.intervalos = intervalos_fecha(filtros)
+        self.pasos = sorted(
+            (clave for clave in _SELECTIVIDAD if self._activo(clave)),
+            key=self.selectividad
+        )
+
+    def _activo(self, clave):
+        if clave == 'fecha':
+            return self.intervalos is not None
+        return bool(valores(self.filtros, clave))
+
+    def selectividad(self, clave):
+        """Fracción estimada de filas que pasan el filtro `clave`"""
+        if clave == 'fecha':
+            dias = sum(hasta - desde + 1 for desde, hasta in self.intervalos)
+            return min(1.0, dias / _DIAS_CORPUS)
+        return min(1.0, _SELECTIVIDAD[clave] * len(valores(self.filtros, clave)))
+
+    def _en_fecha(self, ordinal):
+        return ordinal is not None and any(desde <= ordinal <= hasta for desde, hasta in self.intervalos)
+
+    def filtra_fecha_por_fila(self, hoja_name):
+        """Indica si el filtro de fecha debe evaluarse fila por fila en esta hoja.
+
+        Si el año del nombre de la hoja (p. ej. "TFN 2021") queda completamente
+        dentro del período pedido, todas sus filas coinciden.
+        """
+        if self.intervalos is None:
+            return False
+        anio_hoja = _anio_de(hoja_name)
+        if anio_hoja is not None:
+            completo = intervalo_anio(anio_hoja)
+            if intersectar_intervalos([completo], self.intervalos) == [completo]:
+                return False
+        return True
+
+    def predicados_hoja(self, hoja_name, claves, incluir_fecha=True):
+        """Especializa los pasos para una hoja.
+
+        Devuelve la lista de predicados por fila, o None si ninguna fila de la
+        hoja puede coincidir. Con `incluir_fecha=False` el filtro de fecha queda
+        a cargo del índice de fechas.
+        """
+        hoja_normalizada = normalizar_texto(hoja_name)
+        predicados = []
+
+        for paso in self.pasos:
+            if paso == 'expediente':
+                campos = _campos(claves, 'expediente')
+                buscados = [e.lower() for e in valores(self.filtros, 'expediente')]
+                if not campos:
+                    return None
+                predicados.append(lambda item, campos=campos, buscados=buscados: any(
+                    item.get(c) and any(b in str(item[c]).lower() for b in buscados) for c in campos
+                ))
+
+            elif paso == 'sala':
+                campos = _campos(claves, 'sala')
+                buscadas = set(valores(self.filtros, 'sala'))
+                if not campos:
+                    return None
+                predicados.append(lambda item, campos=campos, buscadas=buscadas: any(
+                    item.get(c) and str(item[c]).upper() in buscadas for c in campos
+                ))
+
+            elif paso == 'fecha':
+                if incluir_fecha and self.filtra_fecha_por_fila(hoja_name):
+                    predicados.append(lambda item: self._en_fecha(ordinal_de_registro(item)))
+
+            elif paso == 'tema':
+                campos = _campos(claves, 'tema', 'caratula', 'resuelve')
+                buscados = [normalizar_texto(t) for t in valores(self.filtros, 'tema')]
+                if not campos:
+                    return None
+                predicados.append(lambda item, campos=campos, buscados=buscados: any(
+                    item.get(c) and any(b in _plegar(str(item[c])) for b in buscados) for c in campos
+                ))
+
+            elif paso == 'tribunal':
+                buscados = [t.lower() for t in valores(self.filtros, 'tribunal')]
+                if any(t in hoja_normalizada for t in buscados):
+                    continue
+                campos = _campos(claves, 'tribunal')
+                if not campos:
+                    return None
+                predicados.append(lambda item, campos=campos, buscados=buscados: any(
+                    item.get(c) and any(t in str(item[c]).lower() for t in buscados) for c in campos
+                ))
+
+        return predicados
+
+    def coincide(self, item, hoja_name):
+        """Evalúa el plan sobre una sola fila"""
+        predicados = self.predicados_hoja(hoja_name, list(item.keys()))
+        return predicados is not None and all(p(item) for p in predicados)
+
+    def posiciones(self, hoja_name, registros, indice=None, recientes_primero=False):
+        """Posiciones de las filas de la hoja que pasan el filtro de fecha, vía búsqueda binaria en el índice.
+
+        Con `recientes_primero` salen ordenadas de la más reciente a la más
+        antigua (las que no tienen fecha, al final).
+        """
+        por_fila = self.filtra_fecha_por_fila(hoja_name)
+        if not por_fila and not recientes_primero:
+            return range(len(registros))
+        if indice is None:
+            indice = IndiceFechas(registros)
+        if not por_fila:
+            return indice.orden(descendente=True)
+        if recientes_primero:
+            return indice.buscar_recientes(self.intervalos)
+        return indice.buscar(self.intervalos)
+
+    def candidatos(self, hoja_name, registros, indice=None, recientes_primero=False):
+        """Filas de la hoja que pasan el filtro de fecha (ver `posiciones`)"""
+        return [registros[p] for p in self.posiciones(hoja_name, registros, indice, recientes_primero)]
+
+    def _iterar_hoja(self, hoja_name, registros, indice, recientes_primero):
+        """Genera (clave de orden, hoja, fila); la clave ordena de la fecha más reciente a la más antigua"""
+        if not registros:
+            return
+        predicados = self.predicados_hoja(hoja_name, list(registros[0].keys()), incluir_fecha=False)
+        if predicados is None:
+            return
+        if recientes_primero and indice is None:
+            indice = IndiceFechas(registros)
+        for posicion in self.posiciones(hoja_name, registros, indice, recientes_primero):
+            item = registros[posicion]
+            if all(p(item) for p in predicados):
+                yield (-(indice.ordinales[posicion] or 0) if recientes_primero else 0), hoja_name, item
+
+    def coincidencias(self, datos_chat, indices=None, recientes_primero=False):
+        """Genera pares (hoja, fila) que cumplen el plan a medida que se encuentran.
+
+        Las filas son las de `datos_chat`, sin copiar ni modificar: los datos
+        cacheados se comparten entre requests (y con el master de gunicorn).
+        `indices` es un dict {hoja: IndiceFechas}; si falta, se arma al vuelo.
+        Con `recientes_primero` se intercalan las hojas para devolver primero
+        las sentencias más recientes de todo el corpus.
+        """
+        if not datos_chat or 'tribunales' not in datos_chat:
+            return
+
+        por_hoja = [
+            self._iterar_hoja(hoja_name, registros, indices.get(hoja_name) if indices else None, recientes_primero)
+            for hoja_name, registros in datos_chat['tribunales'].items()
+        ]
+        if recientes_primero:
+            ternas = heapq.merge(*por_hoja, key=lambda terna: terna[0])
+        else:
+            ternas = (terna for generador in por_hoja for terna in generador)
+        for _, hoja_name, item in ternas:
+            yield hoja_name, item
+
+    def iterar(self, datos_chat, indices=None, recientes_primero=False):
+        """Como `coincidencias`, pero genera copias de las filas con `_fuente` (la hoja)"""
+        for hoja_name, item in self.coincidencias(datos_chat, indices, recientes_primero):
+            yield dict(item, _fuente=hoja_name)
+
+    def ejecutar(self, datos_chat, indices=None):
+        """Recorre las hojas del chat y devuelve las filas que cumplen el plan"""
+        return list(self.iterar(datos_chat, indices))
+
+    def consultar(self, datos_chat, indices=None, limite=10):
+        """(conteo_por_hoja, primeros_resultados), como almacen_sqlite.consultar_chat.
+
+        Sólo se copian las `limite` filas que se devuelven al cliente.
+        """
+        conteos = {}
+        primeros = []
+        for hoja_name, item in self.coincidencias(datos_chat, indices):
+            conteos[hoja_name] = conteos.get(hoja_name, 0) + 1
+            if len(primeros) < limite:
+                primeros.append(dict(item, _fuente=hoja_name))
+        return conteos, primeros
+
+    def factor_selectividad(self, incluir_fecha=True):
+        """Producto de las selectividades estimadas de los pasos"""
+        factor = 1.0
+        for paso in self.pasos:
+            if paso != 'fecha' or incluir_fecha:
+                factor *= self.selectividad(paso)
+        return factor
+
+    def estimar(self, datos_chat, indices=None):
+        """Estimación rápida de la cantidad de resultados, sin recorrer filas.
+
+        El filtro de fecha se cuenta exacto con el índice; el resto se
+        aproxima con la selectividad estimada de cada paso.
+        """
+        if not datos_chat or 'tribunales' not in datos_chat:
+            return 0
+
+        factor = self.factor_selectividad(incluir_fecha=False)
+        total = 0
+        for hoja_name, registros in datos_chat['tribunales'].items():
+            if self.filtra_fecha_por_fila(hoja_name):
+                indice = (indices or {}).get(hoja_name) or IndiceFechas(registros)
+                total += indice.contar(self.intervalos)
+            else:
+                total += len(registros)
+        return round(total * factor)
+
+
+@lru_cache(maxsize=512)
+def _compilar_normalizada(texto_normalizado, hoy):
+    return PlanConsulta(extraer_filtros(texto_normalizado, hoy))
+
+
+def compilar_consulta(query_text):
+    """Compila (o recupera de la caché) el plan de una consulta en texto libre"""
+    return _compilar_normalizada(normalizar_texto(query_text), date.today())
+
+
+def describir_filtro(valor):
+    """Texto legible para un filtro con uno o varios valores"""
+    if isinstance(valor, list):
+        textos = [str(v) for v in valor]
+        return ', '.join(textos[:-1]) + ' o ' + textos[-1]
+    return str(valor)
@@ -0,0 +1,32 @@
+"""Configuración de gunicorn (se lee automáticamente desde el directorio de trabajo).
+
+- `preload_app`: la app se importa una sola vez en el master, que además
+  precarga e indexa los datos; los workers los comparten por copy-on-write.
+- `gc.freeze()` mueve esos objetos a una generación permanente para que el
+  recolector de basura de cada worker no los toque (y no copie sus páginas).
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+preload_app = os.environ.get('TFN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import app
+    import arranque
+
+    with arranque.fase('precalentado'):
+        app.precalentar()
+    gc.freeze()
+    arranque.imprimir()
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        # Sin preload cada worker importa la app por su cuenta: precalentar acá
+        # para que el primer request no pague la carga de datos
+        import app
+        app.precalentar()
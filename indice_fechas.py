@@ -0,0 +1,178 @@
+"""Normalización de fechas e índice ordenado de fechas por hoja.
+
+Las fechas se convierten una sola vez, al ingerir el Excel, a ordinales
+enteros (`date.toordinal()`). Se guardan aparte de las filas, bajo la clave
+`_fechas` de los datos ({hoja: [ordinal por fila]}), para no cambiar la forma
+de las filas que devuelve la API. Con eso, filtrar por año, mes o rango de
+fechas y ordenar por fecha son búsquedas binarias sobre una lista de enteros,
+sin volver a parsear strings.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+CAMPO_FECHAS = '_fechas'
+
+_ISO = re.compile(r'^\s*(\d{4})-(\d{1,2})-(\d{1,2})')
+_DMY = re.compile(r'^\s*(\d{1,2})[/-](\d{1,2})[/-](\d{4})')
+
+
+def ordinal_fecha(valor):
+    """Ordinal entero de una fecha (datetime, date o string), o None si no es fecha"""
+    if isinstance(valor, datetime):
+        return valor.date().toordinal()
+    if isinstance(valor, date):
+        return valor.toordinal()
+    if not valor:
+        return None
+
+    texto = str(valor)
+    match = _ISO.match(texto)
+    if match:
+        anio, mes, dia = match.groups()
+    else:
+        match = _DMY.match(texto)
+        if not match:
+            return None
+        dia, mes, anio = match.groups()
+
+    try:
+        return date(int(anio), int(mes), int(dia)).toordinal()
+    except ValueError:
+        return None
+
+
+def columnas_fecha(headers):
+    """Posiciones de las columnas cuyo nombre contiene 'fecha'"""
+    return [i for i, header in enumerate(headers) if header and 'fecha' in header.lower()]
+
+
+def ordinal_de_fila(row, indices_fecha):
+    """Ordinal de la primera columna de fecha con un valor válido en una fila cruda del Excel"""
+    for i in indices_fecha:
+        if i < len(row):
+            ordinal = ordinal_fecha(row[i])
+            if ordinal is not None:
+                return ordinal
+    return None
+
+
+def ordinal_de_registro(item):
+    """Ordinal de la primera columna de fecha con un valor válido en una fila ya convertida"""
+    for clave, valor in item.items():
+        if 'fecha' in clave.lower():
+            ordinal = ordinal_fecha(valor)
+            if ordinal is not None:
+                return ordinal
+    return None
+
+
+def ordinales_de_hoja(datos, hoja, registros):
+    """Ordinales guardados en `_fechas` para la hoja, o calculados si faltan"""
+    ordinales = (datos.get(CAMPO_FECHAS) or {}).get(hoja)
+    if ordinales is None or len(ordinales) != len(registros):
+        ordinales = [ordinal_de_registro(item) for item in registros]
+    return ordinales
+
+
+def separar_fechas(datos, tablas):
+    """Quita `_fechas` de los datos cargados y devuelve {hoja: ordinales} para cada tabla.
+
+    Si faltan (JSON guardados antes del índice) se calculan desde las columnas
+    de fecha.
+    """
+    ordinales = {hoja: ordinales_de_hoja(datos, hoja, registros) for hoja, registros in tablas.items()}
+    datos.pop(CAMPO_FECHAS, None)
+    return ordinales
+
+
+def unir_intervalos(intervalos):
+    """Ordena y fusiona intervalos cerrados (desde, hasta) de ordinales"""
+    unidos = []
+    for desde, hasta in sorted(intervalos):
+        if desde > hasta:
+            continue
+        if unidos and desde <= unidos[-1][1] + 1:
+            unidos[-1] = (unidos[-1][0], max(unidos[-1][1], hasta))
+        else:
+            unidos.append((desde, hasta))
+    return unidos
+
+
+def intersectar_intervalos(a, b):
+    """Intersección de dos listas de intervalos ya unidos"""
+    resultado = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        desde = max(a[i][0], b[j][0])
+        hasta = min(a[i][1], b[j][1])
+        if desde <= hasta:
+            resultado.append((desde, hasta))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return resultado
+
+
+def intervalo_anio(anio):
+    return (date(anio, 1, 1).toordinal(), date(anio, 12, 31).toordinal())
+
+
+class IndiceFechas:
+    """Índice ordenado (ordinal, posición) de las filas fechadas de una hoja.
+
+    `ordinales` es el ordinal de cada fila por posición; si no se pasa se
+    calcula desde las columnas de fecha.
+    """
+
+    def __init__(self, registros, ordinales=None):
+        if ordinales is None:
+            ordinales = [ordinal_de_registro(item) for item in registros]
+        self.ordinales = ordinales
+        pares = sorted(
+            (ordinal, posicion)
+            for posicion, ordinal in enumerate(ordinales)
+            if ordinal is not None
+        )
+        self.claves = [ordinal for ordinal, _ in pares]
+        self.posiciones = [posicion for _, posicion in pares]
+        self.total = len(registros)
+
+    def rango(self, desde, hasta):
+        """Posiciones de las filas con fecha en [desde, hasta], ordenadas por fecha"""
+        return self.posiciones[bisect_left(self.claves, desde):bisect_right(self.claves, hasta)]
+
+    def buscar(self, intervalos):
+        """Posiciones (en el orden original de la hoja) que caen en alguno de los intervalos"""
+        posiciones = []
+        for desde, hasta in unir_intervalos(intervalos):
+            posiciones.extend(self.rango(desde, hasta))
+        posiciones.sort()
+        return posiciones
+
+    def buscar_recientes(self, intervalos):
+        """Posiciones que caen en los intervalos, de la fecha más reciente a la más antigua"""
+        posiciones = []
+        for desde, hasta in reversed(unir_intervalos(intervalos)):
+            posiciones.extend(reversed(self.rango(desde, hasta)))
+        return posiciones
+
+    def contar(self, intervalos):
+        """Cantidad de filas en los intervalos, sin materializar posiciones"""
+        return sum(
+            bisect_right(self.claves, hasta) - bisect_left(self.claves, desde)
+            for desde, hasta in unir_intervalos(intervalos)
+        )
+
+    def orden(self, descendente=True):
+        """Posiciones ordenadas por fecha; las filas sin fecha van al final"""
+        fechadas = self.posiciones[::-1] if descendente else list(self.posiciones)
+        con_fecha = set(self.posiciones)
+        return fechadas + [p for p in range(self.total) if p not in con_fecha]
+
+
+def construir_indices(tablas, ordinales=None):
+    """Un IndiceFechas por hoja a partir de un dict {hoja: registros} (y {hoja: ordinales})"""
+    ordinales = ordinales or {}
+    return {hoja: IndiceFechas(registros, ordinales.get(hoja)) for hoja, registros in tablas.items()}
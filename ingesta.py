@@ -0,0 +1,422 @@
+"""Programador de cargas de Excel (boletín y chat).
+
+Cada carga se procesa en un proceso aparte, con baja prioridad de CPU y un
+tope de memoria, para que los workers de gunicorn sigan atendiendo el
+dashboard y el chat mientras tanto.
+
+- Hay como máximo una carga en curso por dataset, entre todos los workers:
+  el proceso de ingesta hereda el descriptor de un `flock` por dataset y lo
+  mantiene hasta terminar.
+- Si llega otra carga del mismo dataset mientras hay una en curso, según
+  `TFN_INGESTA_POLITICA` se rechaza (409) o se encola reemplazando a la que
+  estuviera esperando ("coalescer", por defecto): sólo se procesa la última.
+- El resultado se publica de forma atómica (archivo temporal + `os.replace`,
+  o una transacción en SQLite), así que las consultas nunca ven datos a medias.
+
+El estado de cada dataset vive en `<TFN_INGESTA_DIR>/<dataset>.estado.json`.
+
+Sin `fcntl` (sólo en Windows; Linux y macOS lo tienen, también al correr
+`python app.py`) las cargas se procesan dentro del mismo proceso, de a una
+por dataset.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin locks entre procesos, la carga corre en el mismo proceso
+    fcntl = None
+
+INGESTA_DIR = os.environ.get('TFN_INGESTA_DIR', '.ingesta')
+POLITICA = os.environ.get('TFN_INGESTA_POLITICA', 'coalescer')
+MEMORIA_MB = int(os.environ.get('TFN_INGESTA_MEMORIA_MB', 1024))
+PRIORIDAD_NICE = int(os.environ.get('TFN_INGESTA_NICE', 10))
+
+# Trabajos que se conservan en el estado para poder consultarlos por id
+HISTORIAL = 20
+
+ESTADOS_FINALES = ('completada', 'error', 'reemplazada')
+
+# Espera máxima de `?esperar=1`: por debajo del timeout de 30 s de los workers de gunicorn
+ESPERA_MAXIMA_S = float(os.environ.get('TFN_INGESTA_ESPERA_S', 20))
+
+# Serializa los cambios de estado entre hilos del mismo proceso (y reemplaza al flock sin fcntl)
+_lock_estado = threading.Lock()
+_locks_en_proceso = {'boletin': threading.Lock(), 'chat': threading.Lock()}
+
+
+def _ruta(nombre):
+    return os.path.join(INGESTA_DIR, nombre)
+
+
+def _ahora():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def publicar_json(datos, ruta):
+    """Escribe el JSON en un temporal y lo reemplaza de forma atómica"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def leer_estado(dataset):
+    """Estado actual del dataset: trabajo en curso, pendiente e historial"""
+    try:
+        with open(_ruta(f"{dataset}.estado.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'dataset': dataset, 'en_curso': None, 'pendiente': None, 'trabajos': {}}
+
+
+@contextmanager
+def _modificar_estado(dataset):
+    """Lee, permite modificar y publica el estado bajo un lock corto entre procesos"""
+    os.makedirs(INGESTA_DIR, exist_ok=True)
+    with _lock_estado, open(_ruta(f"{dataset}.estado.lock"), 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        estado = leer_estado(dataset)
+        yield estado
+        # Conservar sólo los trabajos más recientes
+        trabajos = estado['trabajos']
+        for id_viejo in list(trabajos)[:-HISTORIAL]:
+            if id_viejo not in (estado['en_curso'], estado['pendiente']):
+                del trabajos[id_viejo]
+        publicar_json(estado, _ruta(f"{dataset}.estado.json"))
+
+
+def _abrir_lock_dataset(dataset):
+    os.makedirs(INGESTA_DIR, exist_ok=True)
+    return os.open(_ruta(f"{dataset}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+
+
+def _tomar_lock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _archivo_trabajo(dataset, id_trabajo):
+    return _ruta(f"{dataset}_{id_trabajo}.xlsx")
+
+
+def _reemplazar_pendiente(dataset, estado, id_nuevo):
+    """Marca como reemplazada la carga que estaba esperando (dentro de _modificar_estado)"""
+    anterior = estado['pendiente']
+    if not anterior:
+        return
+    estado['trabajos'][anterior]['estado'] = 'reemplazada'
+    estado['trabajos'][anterior]['reemplazada_por'] = id_nuevo
+    estado['pendiente'] = None
+    try:
+        os.remove(_archivo_trabajo(dataset, anterior))
+    except FileNotFoundError:
+        pass
+
+
+def _reclamar_pendiente(dataset):
+    """Pasa el trabajo pendiente a en curso (requiere tener el lock del dataset)"""
+    with _modificar_estado(dataset) as estado:
+        id_trabajo = estado['pendiente']
+        if id_trabajo is None:
+            return None
+        estado['pendiente'] = None
+        estado['en_curso'] = id_trabajo
+        estado['trabajos'][id_trabajo].update({'estado': 'procesando', 'inicio': _ahora()})
+        return id_trabajo
+
+
+def _lanzar_proceso(dataset, id_trabajo, salida, lock_fd):
+    """Inicia el proceso de ingesta, que hereda (y retiene) el lock del dataset"""
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), dataset, id_trabajo, os.path.abspath(salida), str(lock_fd)],
+        pass_fds=(lock_fd,)
+    )
+    os.close(lock_fd)
+
+    def esperar():
+        codigo = proceso.wait()
+        if codigo == 0:
+            return
+        # Terminó sin registrar el resultado (p. ej. lo mató el sistema por memoria)
+        with _modificar_estado(dataset) as estado:
+            trabajo = estado['trabajos'].get(estado['en_curso'] or '')
+            if trabajo and trabajo['estado'] == 'procesando':
+                trabajo.update({
+                    'estado': 'error',
+                    'fin': _ahora(),
+                    'error': f"El proceso de ingesta terminó inesperadamente (código {codigo})"
+                })
+                estado['en_curso'] = None
+        # El proceso no llegó a tomar la carga encolada: despacharla desde acá
+        _despachar_pendiente(dataset, salida)
+
+    threading.Thread(target=esperar, daemon=True).start()
+
+
+def _despachar_pendiente(dataset, salida):
+    """Lanza la carga encolada si no hay ninguna en curso"""
+    lock_fd = _abrir_lock_dataset(dataset)
+    if _tomar_lock(lock_fd):
+        id_trabajo = _reclamar_pendiente(dataset)
+        if id_trabajo:
+            _lanzar_proceso(dataset, id_trabajo, salida, lock_fd)
+            return
+    os.close(lock_fd)
+
+
+def _programar_en_proceso(dataset, trabajo, salida):
+    """Sin fcntl: procesa la carga acá mismo, de a una por dataset"""
+    with _locks_en_proceso[dataset]:
+        with _modificar_estado(dataset) as estado:
+            trabajo.update({'estado': 'procesando', 'inicio': _ahora()})
+            estado['trabajos'][trabajo['id']] = trabajo
+            estado['en_curso'] = trabajo['id']
+        _ejecutar_trabajo(dataset, trabajo['id'], salida)
+    return 202, consultar(dataset, trabajo['id']) or trabajo
+
+
+def programar(dataset, contenido, filename, salida):
+    """Registra una carga y la despacha o la encola.
+
+    Devuelve (código HTTP, trabajo): 202 si se aceptó (en curso o encolada)
+    o 409 si ya hay una carga en curso y la política es 'rechazar'.
+    """
+    os.makedirs(INGESTA_DIR, exist_ok=True)
+    id_trabajo = uuid.uuid4().hex[:12]
+    with open(_archivo_trabajo(dataset, id_trabajo), 'wb') as f:
+        f.write(contenido)
+    trabajo = {'id': id_trabajo, 'archivo': filename, 'recibido': _ahora()}
+
+    if fcntl is None:
+        return _programar_en_proceso(dataset, trabajo, salida)
+
+    lock_fd = _abrir_lock_dataset(dataset)
+    if _tomar_lock(lock_fd):
+        with _modificar_estado(dataset) as estado:
+            # Con el lock libre, una carga "procesando" quedó de un proceso que murió sin registrarlo
+            interrumpida = estado['trabajos'].get(estado['en_curso'] or '')
+            if interrumpida and interrumpida['estado'] == 'procesando':
+                interrumpida.update({'estado': 'error', 'fin': _ahora(), 'error': 'El proceso de ingesta se interrumpió'})
+            # Una carga encolada que nadie despachó es más vieja que esta: no debe publicarse después
+            _reemplazar_pendiente(dataset, estado, id_trabajo)
+            trabajo.update({'estado': 'procesando', 'inicio': _ahora()})
+            estado['trabajos'][id_trabajo] = trabajo
+            estado['en_curso'] = id_trabajo
+        _lanzar_proceso(dataset, id_trabajo, salida, lock_fd)
+        return 202, trabajo
+
+    os.close(lock_fd)
+
+    if POLITICA == 'rechazar':
+        os.remove(_archivo_trabajo(dataset, id_trabajo))
+        en_curso = leer_estado(dataset)
+        return 409, {
+            'estado': 'rechazada',
+            'error': 'Ya hay una carga en curso para este conjunto de datos. Intenta nuevamente cuando termine.',
+            'en_curso': en_curso['trabajos'].get(en_curso['en_curso'] or '')
+        }
+
+    # Coalescer: la nueva carga reemplaza a la que estuviera esperando
+    with _modificar_estado(dataset) as estado:
+        _reemplazar_pendiente(dataset, estado, id_trabajo)
+        trabajo['estado'] = 'encolada'
+        estado['trabajos'][id_trabajo] = trabajo
+        estado['pendiente'] = id_trabajo
+
+    # Si la carga en curso terminó mientras tanto, nadie va a tomar la pendiente: tomarla acá
+    _despachar_pendiente(dataset, salida)
+    return 202, consultar(dataset, id_trabajo) or trabajo
+
+
+def consultar(dataset, id_trabajo=None):
+    """Estado de un trabajo puntual, o del dataset completo si no se indica id"""
+    estado = leer_estado(dataset)
+    if id_trabajo is None:
+        return {
+            'dataset': dataset,
+            'en_curso': estado['trabajos'].get(estado['en_curso'] or ''),
+            'pendiente': estado['trabajos'].get(estado['pendiente'] or ''),
+            'ultimos': list(estado['trabajos'].values())[-5:]
+        }
+    return estado['trabajos'].get(id_trabajo)
+
+
+def esperar(dataset, id_trabajo, timeout=ESPERA_MAXIMA_S, intervalo=0.2):
+    """Espera a que el trabajo llegue a un estado final (o se agote el tiempo)"""
+    limite = time.monotonic() + timeout
+    while True:
+        trabajo = consultar(dataset, id_trabajo)
+        if trabajo is None or trabajo['estado'] in ESTADOS_FINALES or time.monotonic() >= limite:
+            return trabajo
+        time.sleep(intervalo)
+
+
+def respuesta_carga(dataset, codigo, trabajo, url_estado):
+    """Respuesta de un endpoint de carga.
+
+    Por defecto devuelve 202 con el trabajo y la URL para consultar su estado.
+    Con `?esperar=1` espera a que termine (hasta ESPERA_MAXIMA_S) y devuelve
+    el resultado como antes; si no terminó a tiempo, devuelve el 202.
+    """
+    # Import local: el proceso de ingesta corre este módulo sin cargar Flask
+    from flask import jsonify, request
+
+    if codigo != 202:
+        return jsonify(trabajo), codigo
+
+    if request.args.get('esperar') in ('1', 'true'):
+        id_trabajo = trabajo['id']
+        trabajo = esperar(dataset, id_trabajo)
+        if trabajo is None:
+            return jsonify({'error': 'Carga no encontrada (ya no figura en el historial)', 'id': id_trabajo}), 404
+
+    # Sin fcntl la carga se procesa en la misma request y ya llega terminada
+    if trabajo['estado'] in ESTADOS_FINALES:
+        if trabajo['estado'] == 'completada':
+            return jsonify(trabajo['resultado'])
+        if trabajo['estado'] == 'error':
+            return jsonify({'error': trabajo['error']}), 500
+        if trabajo['estado'] == 'reemplazada':
+            return jsonify({'error': 'La carga fue reemplazada por otra más reciente', 'trabajo': trabajo}), 409
+
+    if trabajo['estado'] == 'procesando':
+        mensaje = 'Archivo recibido, se está procesando'
+    else:
+        mensaje = 'Archivo recibido, se procesará al terminar la carga en curso'
+    return jsonify({
+        'mensaje': mensaje,
+        'trabajo': trabajo,
+        'url_estado': f"{url_estado}?id={trabajo['id']}"
+    }), 202
+
+
+def respuesta_estado(dataset):
+    """Estado de la carga `?id=...`, o del dataset si no se indica id"""
+    from flask import jsonify, request
+
+    estado = consultar(dataset, request.args.get('id'))
+    if estado is None:
+        return jsonify({'error': 'Carga no encontrada'}), 404
+    return jsonify(estado)
+
+
+# PROCESO DE INGESTA
+
+class _ArchivoSubido:
+    """Lo mínimo que usan los lectores de Excel de un archivo subido"""
+
+    def __init__(self, ruta, filename):
+        self._f = open(ruta, 'rb')
+        self.filename = filename
+
+    def seek(self, posicion):
+        self._f.seek(posicion)
+
+    def read(self):
+        return self._f.read()
+
+    def close(self):
+        self._f.close()
+
+
+def _limitar_proceso():
+    """Baja la prioridad de CPU y fija el tope de memoria del proceso de ingesta"""
+    try:
+        os.nice(PRIORIDAD_NICE)
+    except OSError as e:
+        print(f"⚠ Ingesta: no se pudo bajar la prioridad: {e}")
+    try:
+        import resource
+        limite = MEMORIA_MB * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"⚠ Ingesta: no se pudo limitar la memoria: {e}")
+
+
+def _procesar(dataset, trabajo, salida):
+    """Lee el Excel, publica el resultado y devuelve el resumen que ve el cliente"""
+    import almacen_sqlite
+    import lectores_excel
+
+    archivo = _ArchivoSubido(_archivo_trabajo(dataset, trabajo['id']), trabajo['archivo'])
+    try:
+        if dataset == 'boletin':
+            datos = lectores_excel.leer_excel_y_convertir(archivo)
+            respuesta_subida = lectores_excel.respuesta_subida
+            guardar_sqlite = almacen_sqlite.guardar_boletin
+        else:
+            datos = lectores_excel.leer_excel_chat_y_convertir(archivo)
+            respuesta_subida = lectores_excel.respuesta_subida_chat
+            guardar_sqlite = almacen_sqlite.guardar_chat
+    finally:
+        archivo.close()
+
+    if almacen_sqlite.habilitado():
+        guardar_sqlite(datos)
+    else:
+        publicar_json(datos, salida)
+    return respuesta_subida(datos)
+
+
+def _mensaje_error(e):
+    # Los lectores de Excel envuelven los errores: buscar un MemoryError en la cadena
+    causa = e
+    while causa is not None:
+        if isinstance(causa, MemoryError):
+            return f"El archivo excede el límite de memoria de la ingesta ({MEMORIA_MB} MB)"
+        causa = causa.__cause__ or causa.__context__
+    return str(e)
+
+
+def _ejecutar_trabajo(dataset, id_trabajo, salida):
+    """Procesa una carga y registra su resultado en el estado"""
+    trabajo = leer_estado(dataset)['trabajos'][id_trabajo]
+    print(f"📥 Ingesta {dataset}: procesando {trabajo['archivo']} ({id_trabajo})")
+    try:
+        resultado = {'estado': 'completada', 'resultado': _procesar(dataset, trabajo, salida)}
+    except Exception as e:
+        resultado = {'estado': 'error', 'error': _mensaje_error(e)}
+    finally:
+        try:
+            os.remove(_archivo_trabajo(dataset, id_trabajo))
+        except FileNotFoundError:
+            pass
+
+    with _modificar_estado(dataset) as estado:
+        estado['trabajos'][id_trabajo].update(resultado, fin=_ahora())
+        estado['en_curso'] = None
+    print(f"📦 Ingesta {dataset}: {resultado['estado']} ({id_trabajo})")
+
+
+def ejecutar_trabajos(dataset, id_trabajo, salida, lock_fd):
+    """Bucle del proceso de ingesta: procesa el trabajo y los que se encolen mientras tanto"""
+    _limitar_proceso()
+
+    while id_trabajo:
+        _ejecutar_trabajo(dataset, id_trabajo, salida)
+
+        id_trabajo = _reclamar_pendiente(dataset)
+        if id_trabajo is None:
+            # Soltar el lock y volver a mirar: una carga pudo encolarse justo antes
+            fcntl.flock(lock_fd, fcntl.LOCK_UN)
+            if leer_estado(dataset)['pendiente'] and _tomar_lock(lock_fd):
+                id_trabajo = _reclamar_pendiente(dataset)
+
+
+if __name__ == '__main__':
+    dataset, id_trabajo, salida, lock_fd = sys.argv[1:5]
+    ejecutar_trabajos(dataset, id_trabajo, salida, int(lock_fd))
@@ -0,0 +1,244 @@
+"""Lectura de los Excel subidos (boletín y chat) y resumen de cada carga.
+
+Lo usa el proceso de ingesta (ingesta.py). No importa Flask ni la app, para
+que ese proceso no registre blueprints ni precargue páginas dentro de su
+tope de memoria.
+"""
+from datetime import datetime
+import io
+import traceback
+
+from indice_fechas import CAMPO_FECHAS, columnas_fecha, ordinal_de_fila
+
+# BOLETIN
+
+def leer_excel_y_convertir(archivo_excel):
+    """Convierte el Excel a formato JSON usando openpyxl - VERSIÓN CORREGIDA"""
+    # openpyxl sólo se necesita al subir archivos: importarlo acá acelera el arranque
+    import openpyxl
+    
+    try:
+        print(f"🔍 Procesando archivo: {archivo_excel.filename}")
+        
+        # En lugar de pasar el archivo directamente, lo leemos en memoria
+        archivo_excel.seek(0)
+        file_content = archivo_excel.read()
+        
+        # Crear un objeto BytesIO para simular un archivo
+        excel_buffer = io.BytesIO(file_content)
+        
+        # Cargar el workbook desde el buffer
+        workbook = openpyxl.load_workbook(excel_buffer, data_only=True)
+        
+        datos = {
+            'fecha_actualizacion': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'tfn': [],
+            'tfn_cncaf': [],
+            'tfn_cncaf_csjn': [],
+            CAMPO_FECHAS: {}
+        }
+        
+        print(f"📊 Hojas encontradas: {workbook.sheetnames}")
+        
+        # Procesar cada hoja
+        sheet_mapping = {
+            'TFN': 'tfn',
+            'TFN_CNCAF': 'tfn_cncaf', 
+            'TFN_CNCAF_CSJN': 'tfn_cncaf_csjn'
+        }
+        
+        for sheet_name, data_key in sheet_mapping.items():
+            if sheet_name in workbook.sheetnames:
+                print(f"📄 Procesando hoja: {sheet_name}")
+                sheet = workbook[sheet_name]
+                
+                # Leer headers (primera fila) - CON DEBUG DETALLADO
+                headers = []
+                print(f"🔍 DEBUG - Leyendo headers de {sheet_name}:")
+                for i, cell in enumerate(sheet[1]):
+                    if cell.value is None:
+                        headers.append('')
+                        print(f"   Celda {i}: None -> ''")
+                    else:
+                        # Convertir a string de manera segura CON DEBUG
+                        try:
+                            original_value = cell.value
+                            converted_value = str(original_value).strip()
+                            headers.append(converted_value)
+                            print(f"   Celda {i}: '{original_value}' -> '{converted_value}'")
+                        except Exception as conv_error:
+                            headers.append('')
+                            print(f"   Celda {i}: ERROR en conversión: {conv_error}")
+                
+                print(f"📋 Headers finales para {sheet_name}: {headers}")
+                
+                # NORMALIZAR NOMBRES DE COLUMNAS - CORRECCIÓN CRÍTICA
+                headers_normalizados = []
+                for header in headers:
+                    if header:
+                        # Corregir errores comunes de tipeo
+                        header_normalizado = header.replace('Garatula_TFM', 'Caratula_TFN')
+                        header_normalizado = header_normalizado.replace('Competencia_TFM', 'Competencia_TFN')
+                        header_normalizado = header_normalizado.replace('Expediente_TFM', 'Expediente_TFN')
+                        header_normalizado = header_normalizado.replace('Sala_TFM', 'Sala_TFN')
+                        header_normalizado = header_normalizado.replace('Vocalia_TFM', 'Vocalia_TFN')
+                        header_normalizado = header_normalizado.replace('Resuelve_TFM', 'Resuelve_TFN')
+                        header_normalizado = header_normalizado.replace('Tema_TFM', 'Tema_TFN')
+                        headers_normalizados.append(header_normalizado)
+                    else:
+                        headers_normalizados.append('')
+                
+                print(f"🔧 Headers normalizados: {headers_normalizados}")
+                
+                # Columnas de fecha: se convierten a ordinal una sola vez, acá
+                indices_fecha = columnas_fecha(headers_normalizados)
+                
+                # Leer datos (desde fila 2 en adelante) - MANERA SEGURA
+                sheet_data = []
+                ordinales = []
+                row_count = 0
+                
+                for row in sheet.iter_rows(min_row=2, values_only=True):
+                    row_count += 1
+                    # Verificar si la fila tiene datos (no todos None)
+                    if any(cell is not None for cell in row):
+                        row_dict = {}
+                        for i, value in enumerate(row):
+                            if i < len(headers_normalizados) and headers_normalizados[i]:
+                                # Convertir valor de manera segura
+                                if value is None:
+                                    row_dict[headers_normalizados[i]] = ''
+                                elif isinstance(value, datetime):
+                                    row_dict[headers_normalizados[i]] = value.strftime('%Y-%m-%d %H:%M:%S')
+                                else:
+                                    try:
+                                        row_dict[headers_normalizados[i]] = str(value)
+                                    except:
+                                        row_dict[headers_normalizados[i]] = ''
+                        
+                        if row_dict:  # Solo agregar si tiene datos
+                            sheet_data.append(row_dict)
+                            ordinales.append(ordinal_de_fila(row, indices_fecha))
+                
+                datos[data_key] = sheet_data
+                datos[CAMPO_FECHAS][data_key] = ordinales
+                print(f"✅ {sheet_name}: {len(sheet_data)} registros procesados")
+        
+        print(f"🎉 Procesamiento completado: TFN={len(datos['tfn'])}, CNCAF={len(datos['tfn_cncaf'])}, CSJN={len(datos['tfn_cncaf_csjn'])}")
+        return datos
+        
+    except Exception as e:
+        print(f"❌ Error detallado en leer_excel_y_convertir: {str(e)}")
+        print(f"📝 Stack trace: {traceback.format_exc()}")
+        raise Exception(f"Error procesando Excel: {str(e)}")
+
+def respuesta_subida(datos):
+    """Estadísticas que se devuelven al terminar de procesar el Excel DEL BOLETIN"""
+    print(f"Datos procesados - TFN: {len(datos['tfn'])}, TFN_CNCAF: {len(datos['tfn_cncaf'])}, TFN_CNCAF_CSJN: {len(datos['tfn_cncaf_csjn'])}")
+    return {
+        'mensaje': 'Archivo procesado exitosamente',
+        'fecha_actualizacion': datos['fecha_actualizacion'],
+        'total_tfn': len(datos['tfn']),
+        'total_tfn_cncaf': len(datos['tfn_cncaf']),
+        'total_tfn_cncaf_csjn': len(datos['tfn_cncaf_csjn'])
+    }
+
+# CHAT
+
+def leer_excel_chat_y_convertir(archivo_excel):
+    """Convertir Excel del chat a formato JSON - VERSIÓN CORREGIDA"""
+    # openpyxl sólo se necesita al subir archivos: importarlo acá acelera el arranque
+    import openpyxl
+    
+    try:
+        print(f"🔍 Chat: Procesando archivo: {archivo_excel.filename}")
+        
+        archivo_excel.seek(0)
+        file_content = archivo_excel.read()
+        excel_buffer = io.BytesIO(file_content)
+        
+        print("📖 Chat: Cargando workbook...")
+        workbook = openpyxl.load_workbook(excel_buffer, data_only=True)
+        
+        datos_chat = {
+            'fecha_carga': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'tribunales': {},
+            CAMPO_FECHAS: {}
+        }
+        
+        print(f"📊 Chat: Hojas encontradas: {workbook.sheetnames}")
+        
+        # Procesar cada hoja como tribunal independiente
+        for sheet_name in workbook.sheetnames:
+            print(f"📄 Chat: Procesando hoja: {sheet_name}")
+            sheet = workbook[sheet_name]
+            
+            # Leer headers (primera fila) - MANERA SEGURA
+            headers = []
+            for cell in sheet[1]:
+                if cell.value is None:
+                    headers.append('')
+                else:
+                    try:
+                        headers.append(str(cell.value).strip())
+                    except:
+                        headers.append('')
+            
+            print(f"📋 Chat: Headers para {sheet_name}: {headers}")
+            
+            # Columnas de fecha: se convierten a ordinal una sola vez, acá
+            indices_fecha = columnas_fecha(headers)
+            
+            # Leer datos (desde fila 2) - MANERA SEGURA
+            sheet_data = []
+            ordinales = []
+            row_count = 0
+            
+            for row in sheet.iter_rows(min_row=2, values_only=True):
+                row_count += 1
+                # Verificar si la fila tiene datos
+                if any(cell is not None for cell in row):
+                    row_dict = {}
+                    for i, value in enumerate(row):
+                        if i < len(headers) and headers[i]:
+                            # Convertir valor de manera segura
+                            if value is None:
+                                row_dict[headers[i]] = ''
+                            elif isinstance(value, datetime):
+                                # Conservar la hora cuando la celda la trae
+                                formato = '%Y-%m-%d' if value.time() == datetime.min.time() else '%Y-%m-%d %H:%M:%S'
+                                row_dict[headers[i]] = value.strftime(formato)
+                            else:
+                                try:
+                                    row_dict[headers[i]] = str(value)
+                                except:
+                                    row_dict[headers[i]] = ''
+                    
+                    if row_dict:  # Solo agregar si tiene datos
+                        sheet_data.append(row_dict)
+                        ordinales.append(ordinal_de_fila(row, indices_fecha))
+            
+            if sheet_data:
+                datos_chat['tribunales'][sheet_name] = sheet_data
+                datos_chat[CAMPO_FECHAS][sheet_name] = ordinales
+                print(f"✅ Chat: {sheet_name}: {len(sheet_data)} registros")
+        
+        print(f"🎉 Chat: Procesamiento completado. Total hojas: {len(datos_chat['tribunales'])}")
+        return datos_chat
+        
+    except Exception as e:
+        print(f"❌ Error detallado en chat: {str(e)}")
+        print(f"📝 Stack trace: {traceback.format_exc()}")
+        raise Exception(f"Error procesando Excel del chat: {str(e)}")
+
+def respuesta_subida_chat(datos_chat):
+    """Estadísticas que se devuelven al terminar de procesar el Excel del chat"""
+    total_registros = sum(len(registros) for registros in datos_chat['tribunales'].values())
+    print(f"Datos del chat procesados - {total_registros} registros")
+    return {
+        'mensaje': 'Datos del chat procesados exitosamente',
+        'fecha_carga': datos_chat['fecha_carga'],
+        'total_registros': total_registros,
+        'tribunales_cargados': list(datos_chat['tribunales'].keys()),
+        'detalle_por_tribunal': {k: len(v) for k, v in datos_chat['tribunales'].items()}
+    }